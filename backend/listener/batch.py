@@ -0,0 +1,64 @@
+"""Debounced batches of file events for the server's bulk index endpoint."""
+from collections import OrderedDict
+
+import requests
+
+
+class Batch:
+    """Pending updates, one per file: the last event of a file wins. A
+    batch is due once no event arrived for `debounce` seconds, or at the
+    latest `max_delay` seconds after its first event."""
+
+    def __init__(self, debounce, max_delay):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.updates = OrderedDict()
+        self.started = None
+        self.touched = None
+
+    def __len__(self):
+        return len(self.updates)
+
+    def add(self, path, filename, type_names, now):
+        key = (path, filename)
+        self.updates.pop(key, None)
+        self.updates[key] = type_names
+        self.started = self.started or now
+        self.touched = now
+
+    def due(self, now):
+        return bool(self.updates) and \
+            (now - self.touched >= self.debounce or
+             now - self.started >= self.max_delay)
+
+    def clear(self):
+        self.updates.clear()
+        self.started = self.touched = None
+
+    def send(self, session, url, now):
+        """Post the updates to `url`. They are dropped once the server took
+        them, or rejected them as invalid (4xx), which sending them again
+        would not change. On connection and server errors they are kept
+        and sent again, with any newer updates, once due again."""
+        updates = [{
+            "path": path,
+            "filename": filename,
+            "type_names": type_names
+        } for (path, filename), type_names in self.updates.items()]
+        print(f"Sending {len(updates)} updates", flush=True)
+        try:
+            response = session.post(url, json={"updates": updates})
+            if 400 <= response.status_code < 500:
+                print(f"Dropping {len(updates)} updates rejected by the "
+                      f"server: {response.status_code} {response.text}",
+                      flush=True)
+            else:
+                response.raise_for_status()
+
+        except requests.RequestException as e:
+            print(f"Failed to send updates: {e}", flush=True)
+            self.touched = self.started = now
+            return False
+
+        self.clear()
+        return True
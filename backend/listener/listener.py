@@ -1,19 +1,55 @@
+import os
+import time
+
 import requests
 import inotify.adapters
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from batch import Batch
+
+WATCH_DIR = os.environ.get("WATCH_DIR", "/app/exts")
+SERVER_URL = os.environ.get("SERVER_URL", "http://server:8443")
+
+# A batch is sent once no event arrived for DEBOUNCE_SECONDS, or at the
+# latest MAX_BATCH_DELAY after its first event.
+DEBOUNCE_SECONDS = float(os.environ.get("DEBOUNCE_SECONDS", 1))
+MAX_BATCH_DELAY = float(os.environ.get("MAX_BATCH_DELAY", 10))
+
+# rsync writes to a temporary name and renames it into place.
+INDEX_EVENTS = {"IN_CLOSE_WRITE", "IN_MOVED_TO"}
+DELETE_EVENTS = {"IN_DELETE", "IN_MOVED_FROM"}
+
+
+def make_session():
+    retry = Retry(total=8, backoff_factor=0.5,
+                  status_forcelist=(500, 502, 503, 504),
+                  method_whitelist=frozenset(["POST"]))
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(max_retries=retry))
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    return session
+
 
 def main():
-    notify = inotify.adapters.Inotify()
-    notify.add_watch("/app/exts")
-
-    for event in notify.event_gen(yield_nones=False):
-        (_, type_names, path, filename) = event
-        if set(type_names).intersection(set(["IN_CLOSE_WRITE", "IN_DELETE"])):
-            print(f"New update: {filename} - {type_names}", flush=True)
-            requests.post("http://server:8443/index_new", json={
-                "path": path,
-                "filename": filename,
-                "type_names": type_names
-            })
+    session = make_session()
+    notify = inotify.adapters.Inotify(
+        block_duration_s=min(DEBOUNCE_SECONDS, 1))
+    notify.add_watch(WATCH_DIR)
+    batch = Batch(DEBOUNCE_SECONDS, MAX_BATCH_DELAY)
+
+    for event in notify.event_gen(yield_nones=True):
+        now = time.monotonic()
+        if event is not None:
+            (_, type_names, path, filename) = event
+            type_names = [type_name for type_name in type_names
+                          if type_name in INDEX_EVENTS | DELETE_EVENTS]
+            if type_names and filename.endswith(".vsix"):
+                print(f"New update: {filename} - {type_names}", flush=True)
+                batch.add(path, filename, type_names, now)
+
+        if batch.due(now):
+            batch.send(session, f"{SERVER_URL}/index_batch", now)
 
 if __name__ == '__main__':
     main()
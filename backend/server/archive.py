@@ -0,0 +1,182 @@
+"""Random access to VSIX members without re-parsing the zip directory."""
+import os
+import zlib
+import struct
+import threading
+from zipfile import ZipFile, BadZipFile, ZIP_STORED, ZIP_DEFLATED
+from contextlib import contextmanager
+from collections import OrderedDict, namedtuple
+
+LOCAL_HEADER_SIZE = 30
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+Member = namedtuple("Member", ["header_offset", "compress_type", "flag_bits",
+                               "compress_size", "file_size", "crc"])
+
+
+class Archive:
+    """An open VSIX with its member offset table read once. Members are
+    read with `os.pread`, so one handle can serve several threads."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.fd = os.open(filename, os.O_RDONLY)
+        try:
+            with open(self.fd, "rb", closefd=False) as file, \
+                    ZipFile(file) as zip_file:
+                self.members = {
+                    info.filename: Member(info.header_offset,
+                                          info.compress_type, info.flag_bits,
+                                          info.compress_size, info.file_size,
+                                          info.CRC)
+                    for info in zip_file.infolist()
+                }
+
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+        self._data_offsets = {}
+
+    def member(self, name):
+        try:
+            return self.members[name]
+
+        except KeyError:
+            raise KeyError(f"There is no item named {name!r} in the archive")
+
+    def data_offset(self, name):
+        """Offset of the (possibly compressed) bytes of `name`."""
+        offset = self._data_offsets.get(name)
+        if offset is None:
+            member = self.member(name)
+            header = os.pread(self.fd, LOCAL_HEADER_SIZE, member.header_offset)
+            if header[:4] != LOCAL_HEADER_SIGNATURE:
+                raise BadZipFile(f"Bad local header for {name!r} "
+                                 f"in {self.filename}")
+
+            name_length, extra_length = struct.unpack("<HH", header[26:30])
+            offset = member.header_offset + LOCAL_HEADER_SIZE + \
+                name_length + extra_length
+            self._data_offsets[name] = offset
+
+        return offset
+
+    def stored_span(self, name):
+        """`(offset, size)` of the bytes of `name` if it is stored as is
+        (neither compressed nor encrypted), so it can be sent straight from
+        the file, otherwise None."""
+        member = self.member(name)
+        if member.compress_type != ZIP_STORED or member.flag_bits & 0x1:
+            return None
+
+        return self.data_offset(name), member.file_size
+
+    def read(self, name):
+        member = self.member(name)
+        if member.flag_bits & 0x1:
+            raise RuntimeError(f"{name!r} in {self.filename} is encrypted")
+
+        if member.compress_type not in (ZIP_STORED, ZIP_DEFLATED):
+            with ZipFile(self.filename) as zip_file:
+                return zip_file.read(name)
+
+        data = os.pread(self.fd, member.compress_size, self.data_offset(name))
+        if member.compress_type == ZIP_DEFLATED:
+            data = zlib.decompress(data, -zlib.MAX_WBITS)
+
+        if zlib.crc32(data) != member.crc:
+            raise BadZipFile(f"Bad CRC-32 for {name!r} in {self.filename}")
+
+        return data
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ArchivePool:
+    """Bounded LRU of open archives. The least recently used archives that
+    no thread is reading from are closed once `max_open` is exceeded.
+    Archives discarded while in use are closed by their last user."""
+
+    def __init__(self, max_open):
+        self.max_open = max_open
+        self._archives = OrderedDict()
+        # archive -> number of threads reading from it
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._archives)
+
+    def _evict(self):
+        excess = len(self._archives) - self.max_open
+        for filename, archive in list(self._archives.items()):
+            if excess <= 0:
+                break
+
+            if archive not in self._users:
+                del self._archives[filename]
+                archive.close()
+                excess -= 1
+
+    def _checkout(self, filename):
+        self._archives.move_to_end(filename)
+        archive = self._archives[filename]
+        self._users[archive] = self._users.get(archive, 0) + 1
+        self._evict()
+
+    def _release(self, archive):
+        self._users[archive] -= 1
+        if self._users[archive] == 0:
+            del self._users[archive]
+            if self._archives.get(archive.filename) is not archive:
+                # Discarded while in use.
+                archive.close()
+
+        self._evict()
+
+    @contextmanager
+    def acquire(self, filename):
+        filename = str(filename)
+        with self._lock:
+            archive = self._archives.get(filename)
+            if archive is not None:
+                self._checkout(filename)
+
+        if archive is None:
+            opened = Archive(filename)
+            with self._lock:
+                archive = self._archives.setdefault(filename, opened)
+                self._checkout(filename)
+
+            if archive is not opened:
+                opened.close()
+
+        try:
+            yield archive
+
+        finally:
+            with self._lock:
+                self._release(archive)
+
+    def read(self, filename, name):
+        with self.acquire(filename) as archive:
+            return archive.read(name)
+
+    def stored_span(self, filename, name):
+        with self.acquire(filename) as archive:
+            return archive.stored_span(name)
+
+    def discard(self, filename):
+        """Forget the member table and handle of a file that changed on
+        disk. An archive still in use is closed when its readers are done,
+        while new readers open the file again."""
+        filename = str(filename)
+        with self._lock:
+            archive = self._archives.pop(filename, None)
+            if archive is not None and archive not in self._users:
+                archive.close()
+
+
+ARCHIVES = ArchivePool(max_open=int(os.environ.get("MAX_OPEN_ARCHIVES", 64)))
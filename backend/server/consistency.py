@@ -0,0 +1,128 @@
+"""Consistency check of an incrementally maintained index against a fresh
+rebuild of the same packages.
+
+Packs are told apart by `(publisher, name)`, as the two indexes hold
+different pack objects. Structure that depends on the order of the
+changes (trie node splits, document ids) is not compared, only what the
+queries read off it.
+"""
+from contextlib import nullcontext
+
+from indexer import Indexer
+
+
+def pack_id(extension_pack):
+    return extension_pack.publisher, extension_pack.name
+
+
+def pack_ids(packs):
+    return sorted(pack_id(pack) for pack in packs)
+
+
+def rebuild(indexer):
+    """A new index of the packages `indexer` holds, built in one pass."""
+    return build(indexer.start_dir, packages(indexer))
+
+
+def packages(indexer):
+    """`(filename, metadata)` of every package `indexer` holds."""
+    return [(filename, indexer.get_package(filename).metadata)
+            for filename in sorted(indexer.filename_to_extension_pack)]
+
+
+def build(start_dir, packages):
+    fresh = Indexer(start_dir)
+    fresh.index_parsed((filename, metadata, None)
+                       for filename, metadata in packages)
+    return fresh
+
+
+def trie_keys(*indexers):
+    keys = set()
+    for indexer in indexers:
+        for words in indexer.package_words.values():
+            keys.update(words)
+
+    return sorted(keys)
+
+
+def index_state(indexer, keys):
+    """What the queries see of `indexer`, with the trie looked up at
+    `keys`."""
+    trie = indexer.trie
+    return {
+        "packs": {
+            pack_id(pack): (sorted(pack.packages),
+                            dict(pack.filename_to_version),
+                            dict(pack.indexed_by))
+            for pack in indexer.extension_packs
+        },
+        "files": {filename: pack_id(pack) for filename, pack
+                  in indexer.filename_to_extension_pack.items()},
+        "package words": {filename: sorted(words) for filename, words
+                          in indexer.package_words.items()},
+        "trie references": {pack_id(pack): count for pack, count
+                            in trie.references().items()},
+        "trie leaves": {string: pack_ids(packs)
+                        for string, packs in trie.leaves().items()},
+        "trie": {key: pack_ids(trie.get_all([key])) for key in keys},
+        "search documents": pack_ids(pack for pack in indexer.extension_packs
+                                     if pack in indexer.search_index),
+        "search vocabulary": list(indexer.search_index.vocabulary),
+        "search postings": {
+            token: sorted((pack_id(pack), frequency) for pack, frequency
+                          in indexer.search_index.postings(token).items())
+            for token in indexer.search_index.vocabulary
+        },
+        "criteria": {
+            filter_type: {value: pack_ids(packs)
+                          for value, packs in index.items()}
+            for filter_type, index in indexer.criteria_indexes.items()
+        },
+        "category names": dict(indexer.category_names),
+        "sort orders": {
+            sort_by: [sort_index.key_of(pack)
+                      for pack in sort_index.page(0, None)]
+            for sort_by, sort_index in indexer.sort_indexes.items()
+        }
+    }
+
+
+def compare(indexer, fresh):
+    """Differences between `indexer` and `fresh`, as readable strings; an
+    empty list when they agree."""
+    keys = trie_keys(indexer, fresh)
+    return state_differences(index_state(indexer, keys),
+                             index_state(fresh, keys))
+
+
+def state_differences(state, fresh_state):
+    differences = []
+    for part, value in state.items():
+        expected = fresh_state[part]
+        if value == expected:
+            continue
+
+        if isinstance(value, dict):
+            for key in sorted(set(value) | set(expected), key=repr):
+                if value.get(key) != expected.get(key):
+                    differences.append(f"{part} {key!r}: {value.get(key)!r}, "
+                                       f"rebuilt {expected.get(key)!r}")
+        else:
+            differences.append(f"{part}: {value!r}, rebuilt {expected!r}")
+
+    return differences
+
+
+def check_index(indexer, hold=nullcontext):
+    """Compare `indexer` with a rebuild of its packages. `indexer` is only
+    read while `hold()` is held; the rebuild happens after, so an index
+    that keeps changing is not held up meanwhile. Keys missing from the
+    trie of `indexer` still show in its leaves."""
+    with hold():
+        keys = trie_keys(indexer)
+        state = index_state(indexer, keys)
+        held = packages(indexer)
+
+    return state_differences(
+        state, index_state(build(indexer.start_dir, held), keys))
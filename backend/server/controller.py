@@ -1,17 +1,65 @@
+import json
 from collections import defaultdict
 
+from indexer import EXTENSION_ID_FILTER_TYPE, EXTENSION_NAME_FILTER_TYPE
 
-def count(exts):
-    counts = defaultdict(int)
-    for ext in exts:
-        for cat in ext.categories:
-            counts[cat] += 1
+# Filter types naming the same extensions in different ways; VS Code sends
+# them together as alternatives, so they form one group.
+IDENTITY_GROUP = "identity"
+FILTER_GROUPS = {
+    EXTENSION_ID_FILTER_TYPE: IDENTITY_GROUP,
+    EXTENSION_NAME_FILTER_TYPE: IDENTITY_GROUP
+}
 
-    to_ret = []
-    for key, value in counts.items():
-        to_ret.append({
-            "name": key,
-            "count": value
-        })
 
-    return to_ret
+def match_criteria(indexer, criteria):
+    """Extension packs matching the structured (non text) criteria. Values
+    of the same filter type, and extension ids and names together, are
+    alternatives; the facet filters (category, tag) must all match.
+    Returns None when no such criteria were given."""
+    groups = defaultdict(set)
+    for criterion in criteria:
+        if criterion.filterType in indexer.criteria_indexes:
+            group = FILTER_GROUPS.get(criterion.filterType,
+                                      criterion.filterType)
+            groups[group].update(
+                indexer.lookup(criterion.filterType, criterion.value))
+
+    if not groups:
+        return None
+
+    matches, *others = sorted(groups.values(), key=len)
+    for packs in others:
+        matches = {pack for pack in matches if pack in packs}
+
+    return matches
+
+
+def query_response(extensions, total, categories, flags, paging_token=None):
+    """Splice the pre-encoded extension fragments, rendered for the query
+    `flags`, into an `extensionquery` response body."""
+    result_metadata = [
+        {
+            "metadataType": "ResultCount",
+            "metadataItems": [
+                {
+                    "name": "TotalCount",
+                    "count": total
+                }
+            ]
+        },
+        {
+            "metadataType": "Categories",
+            "metadataItems": categories
+        }
+    ]
+
+    return b"".join([
+        b'{"results":[{"extensions":[',
+        b",".join(ext.query_fragment(flags) for ext in extensions),
+        b'],"pagingToken":',
+        json.dumps(paging_token).encode(),
+        b',"resultMetadata":',
+        json.dumps(result_metadata, separators=(",", ":")).encode(),
+        b"}]}"
+    ])
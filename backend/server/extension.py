@@ -1,29 +1,51 @@
 """Extension module."""
 import uuid
 from pathlib import Path
-from zipfile import ZipFile
 from datetime import datetime
 
-from bs4 import BeautifulSoup
 from cached_property import cached_property
 
-def open_zip(func):
-    def inner_function(self, *args, **kwargs):
-        with ZipFile(self.filename) as zip_f:
-            return func(self, zip_f, *args, **kwargs)
-
-    return inner_function
+from archive import ARCHIVES
+from manifest import Manifest
 
 
 MANIFEST = "Microsoft.VisualStudio.Code.Manifest"
 DETAILS = "Microsoft.VisualStudio.Services.Content.Details"
 LICENSE = "Microsoft.VisualStudio.Services.Content.License"
 ICON = "Microsoft.VisualStudio.Services.Icons.Default"
+ICON_SMALL = "Microsoft.VisualStudio.Services.Icons.Small"
+VSIX_MANIFEST = "Microsoft.VisualStudio.Services.VsixManifest"
+
+# ExtensionQueryFlags that change what a query result contains.
+INCLUDE_VERSIONS = 0x1
+INCLUDE_FILES = 0x2
+INCLUDE_CATEGORY_AND_TAGS = 0x4
+INCLUDE_VERSION_PROPERTIES = 0x10
+INCLUDE_ASSET_URI = 0x80
+INCLUDE_STATISTICS = 0x100
+INCLUDE_LATEST_VERSION_ONLY = 0x200
+
+RENDERED_QUERY_FLAGS = INCLUDE_VERSIONS | INCLUDE_FILES | \
+    INCLUDE_CATEGORY_AND_TAGS | INCLUDE_VERSION_PROPERTIES | \
+    INCLUDE_ASSET_URI | INCLUDE_STATISTICS | INCLUDE_LATEST_VERSION_ONLY
+ALL_QUERY_FLAGS = RENDERED_QUERY_FLAGS & ~INCLUDE_LATEST_VERSION_ONLY
+
+
+def read_metadata(filename):
+    """Process pool worker: parse the manifest of `filename` into a plain
+    metadata record, returning `(filename, metadata, error)`."""
+    try:
+        return filename, Extension(filename).metadata, None
+
+    except Exception as e:
+        return filename, None, str(e)
 
 
 class Extension:
-    def __init__(self, filename):
+    def __init__(self, filename, metadata=None):
         self.filename = filename
+        if metadata is not None:
+            self.metadata = metadata
 
     @property
     def stats(self):
@@ -39,102 +61,84 @@ class Extension:
 
     @property
     def name(self):
-        return self.identity["id"]
+        return self.metadata.name
 
     @property
     def version(self):
-        return self.identity["version"]
+        return self.metadata.version
 
     @property
     def publisher(self):
-        return self.identity["publisher"]
-
-    @property
-    def identity(self):
-        return self.xml_tree.find("metadata").find("identity")
+        return self.metadata.publisher
 
     @property
     def display_name(self):
-        return self.xml_tree.find("metadata").find("displayname").text
+        return self.metadata.display_name
 
     @property
     def description(self):
-        return self.xml_tree.find("metadata").find("description").text
+        return self.metadata.description
 
     @property
     def properties(self):
-        return {
-            elem["id"]: elem["value"]
-            for elem in self.xml_tree.find("properties").find_all("property")
-        }
+        return self.metadata.properties
 
     @cached_property
-    def xml_tree(self):
-        return BeautifulSoup(self.manifest, "html.parser")
+    def metadata(self):
+        """The parsed manifest. Picklable, so it can be produced by a worker
+        process; the raw manifest bytes are not kept around."""
+        return Manifest.parse(self.read_file("extension.vsixmanifest"))
 
     @property
     def icon_path(self):
-        return self.xml_tree.find("metadata").find("icon").text
+        return self.metadata.icon_path
 
     @property
     def tags(self):
-        return self.xml_tree.find("metadata").find("tags").text.split(",")
+        return self.metadata.tags
 
     @property
     def categories(self):
-        return self.xml_tree.find("metadata").find("categories").text\
-            .split(",")
-
+        return self.metadata.categories
 
     @property
     def assets(self):
-        return {
-            elem["type"]: elem["path"]
-            for elem in self.xml_tree.find("assets").find_all("asset")
-        }
+        return self.metadata.assets
 
-    @cached_property
-    @open_zip
-    def icon(self, zip_file):
-        with zip_file.open(self.icon_path) as icon_file:
-            return icon_file.read()
+    @property
+    def icon(self):
+        return self.read_file(self.icon_path)
 
-    @open_zip
-    def read_file(self, zip_file, file_path):
-        with zip_file.open(file_path) as f:
-            return f.read()
+    def read_file(self, file_path):
+        return ARCHIVES.read(self.filename, file_path)
 
-    @cached_property
-    @open_zip
-    def manifest(self, zip_file):
-        with zip_file.open("extension.vsixmanifest") as f:
-            manifest = f.read()
+    def asset_path(self, asset_type):
+        if asset_type in (ICON, ICON_SMALL):
+            return self.icon_path
 
-        return manifest
+        if asset_type == VSIX_MANIFEST:
+            return "extension.vsixmanifest"
 
-    @cached_property
-    @open_zip
-    def license(self, zip_file):
-        with zip_file.open(self.assets[LICENSE]) as f:
-            zip_license = f.read()
+        return self.assets[asset_type]
 
-        return zip_license
+    def read_asset(self, asset_type):
+        return self.read_file(self.asset_path(asset_type))
 
-    @cached_property
-    @open_zip
-    def details(self, zip_file):
-        with zip_file.open(self.assets[DETAILS]) as f:
-            details = f.read()
+    @property
+    def manifest(self):
+        return self.read_file("extension.vsixmanifest")
 
-        return details
+    @property
+    def license(self):
+        return self.read_file(self.assets[LICENSE])
 
-    @cached_property
-    @open_zip
-    def code_manifest(self, zip_file):
-        with zip_file.open(self.assets[MANIFEST]) as f:
-            manifest = f.read()
+    @property
+    def details(self):
+        return self.read_file(self.assets[DETAILS])
 
-        return manifest
+    @property
+    def code_manifest(self):
+        return self.read_file(self.assets[MANIFEST])
 
     def __hash__(self):
         return hash(uuid.uuid3(uuid.NAMESPACE_OID, str(self.filename)))
@@ -153,18 +157,19 @@ class Extension:
 
     @property
     def query_data(self):
-        properties = []
-        for key, value in self.properties.items():
-            properties.append({
-                "key": key,
-                "value": value
-            })
-
-        return {
+        return self.render(ALL_QUERY_FLAGS)
+
+    def render(self, flags):
+        """This version's entry in a query result, limited to the parts
+        requested by the query `flags`."""
+        data = {
             "version": self.version,
             "flags": "validated",
-            "lastUpdated": self.modified_time,
-            "files": [
+            "lastUpdated": self.modified_time
+        }
+
+        if flags & INCLUDE_FILES:
+            data["files"] = [
                 {
                     "assetType": "Microsoft.VisualStudio.Code.Manifest",
                     "source": f"{self.base_url}/Microsoft.VisualStudio.Code.Manifest"
@@ -194,8 +199,19 @@ class Extension:
                     "assetType": "Microsoft.VisualStudio.Services.VSIXPackage",
                     "source": self.download_url
                 }
-            ],
-            "properties": properties,
-            "assetUri": self.base_url,
-            "fallbackAssetUri": self.base_url
-            }
\ No newline at end of file
+            ]
+
+        if flags & INCLUDE_VERSION_PROPERTIES:
+            data["properties"] = [
+                {
+                    "key": key,
+                    "value": value
+                }
+                for key, value in self.properties.items()
+            ]
+
+        if flags & INCLUDE_ASSET_URI:
+            data["assetUri"] = self.base_url
+            data["fallbackAssetUri"] = self.base_url
+
+        return data
@@ -1,6 +1,21 @@
+import json
 import uuid
+import bisect
+from collections import Counter
 from distutils.version import LooseVersion
 
+from extension import ALL_QUERY_FLAGS, RENDERED_QUERY_FLAGS, \
+    INCLUDE_VERSIONS, INCLUDE_CATEGORY_AND_TAGS, INCLUDE_STATISTICS, \
+    INCLUDE_LATEST_VERSION_ONLY
+
+
+def version_key(version):
+    """LooseVersion ordering, made total for versions that mix numeric and
+    alphabetic components at the same position."""
+    return tuple((0, part, "") if isinstance(part, int) else (1, 0, part)
+                 for part in LooseVersion(version).version)
+
+
 class ExtensionPack:
     def __init__(self, publisher, name):
         self.publisher = publisher
@@ -8,7 +23,12 @@ class ExtensionPack:
 
         self.packages = {}
         self.filename_to_version = {}
-        self.indexed_by = set()
+        # Versions in ascending order, alongside their parsed keys.
+        self._versions = []
+        self._version_keys = []
+        # trie key -> number of this pack's packages indexed under it
+        self.indexed_by = Counter()
+        self._fragments = {}
 
     def __len__(self):
         return len(self.packages)
@@ -20,13 +40,55 @@ class ExtensionPack:
         return self.packages[item]
 
     def add_package(self, package):
+        """Add `package` in place of the package of the same version and of
+        the one last read from the same file. Returns the replaced ones."""
+        filename = str(package.filename)
+        replaced = []
+        version = self.filename_to_version.get(filename)
+        if version is not None and version != package.version:
+            replaced.append(self.packages[version])
+            self.remove_package(self.packages[version])
+
+        previous = self.packages.get(package.version)
+        if previous is not None:
+            replaced.append(previous)
+            self.filename_to_version.pop(str(previous.filename), None)
+        else:
+            key = version_key(package.version)
+            index = bisect.bisect_right(self._version_keys, key)
+            self._version_keys.insert(index, key)
+            self._versions.insert(index, package.version)
+
         self.packages[package.version] = package
-        self.filename_to_version[package.filename] = package.version
+        self.filename_to_version[str(package.filename)] = package.version
+        self._fragments = {}
+        return replaced
 
     def remove_package(self, package):
-        version = self.filename_to_version[package.filename]
-        del self.filename_to_version[package.filename]
-        del self.packages[version]
+        version = self.filename_to_version.pop(str(package.filename))
+        if self.packages.pop(version, None) is None:
+            return
+
+        key = version_key(version)
+        index = bisect.bisect_left(self._version_keys, key)
+        while index < len(self._versions) and \
+                self._version_keys[index] == key:
+            if self._versions[index] == version:
+                del self._version_keys[index]
+                del self._versions[index]
+                break
+
+            index += 1
+
+        self._fragments = {}
+
+    @property
+    def publisher_id(self):
+        return str(uuid.uuid3(uuid.NAMESPACE_OID, self.publisher))
+
+    @property
+    def extension_id(self):
+        return str(uuid.uuid3(uuid.NAMESPACE_OID, self.name))
 
     @property
     def categories(self):
@@ -34,26 +96,43 @@ class ExtensionPack:
 
     @property
     def latest_package(self):
-        sorted_versions = sorted(list(self.packages.keys()), key=LooseVersion)
-        return self.packages[sorted_versions[-1]]
+        return self.packages[self._versions[-1]]
 
     @property
     def sorted_packages(self):
-        return sorted(list(self.packages.values()),
-                      key=lambda package: LooseVersion(package.version), reverse=True)
+        return [self.packages[version] for version in reversed(self._versions)]
+
+    def query_fragment(self, flags):
+        """`render(flags)` encoded once per combination of the flags that
+        matter, and reused until the pack changes."""
+        flags &= RENDERED_QUERY_FLAGS
+        fragment = self._fragments.get(flags)
+        if fragment is None:
+            fragment = json.dumps(self.render(flags),
+                                  separators=(",", ":")).encode()
+            self._fragments[flags] = fragment
+
+        return fragment
+
+    @property
+    def query_json(self):
+        return self.query_fragment(ALL_QUERY_FLAGS)
 
     @property
     def query_data(self):
-        return {
+        return self.render(ALL_QUERY_FLAGS)
+
+    def render(self, flags):
+        """This pack's entry in a query result, limited to the parts
+        requested by the query `flags`."""
+        data = {
             "publisher": {
-                "publisherId": uuid.uuid3(
-                    uuid.NAMESPACE_OID, self.publisher
-                ),
+                "publisherId": self.publisher_id,
                 "publisherName": self.publisher,
                 "displayName": self.publisher,
                 "flags": "none"
             },
-            "extensionId": uuid.uuid3(uuid.NAMESPACE_OID, self.name),
+            "extensionId": self.extension_id,
             "extensionName": self.name,
             "displayName": self.latest_package.display_name,
             "flags": "validated, public",
@@ -61,8 +140,21 @@ class ExtensionPack:
             "publishedDate": self.latest_package.created_time,
             "releaseDate": self.latest_package.created_time,
             "shortDescription": self.latest_package.description,
-            "versions": [package.query_data for package in self.sorted_packages],
-            "statistics": [
+            "deploymentType": 0
+        }
+
+        if flags & INCLUDE_LATEST_VERSION_ONLY:
+            data["versions"] = [self.latest_package.render(flags)]
+        elif flags & INCLUDE_VERSIONS:
+            data["versions"] = [package.render(flags)
+                                for package in self.sorted_packages]
+
+        if flags & INCLUDE_CATEGORY_AND_TAGS:
+            data["categories"] = self.latest_package.categories
+            data["tags"] = self.latest_package.tags
+
+        if flags & INCLUDE_STATISTICS:
+            data["statistics"] = [
                 {
                     "statisticName": "install",
                     "value": 0
@@ -95,6 +187,6 @@ class ExtensionPack:
                     "statisticName": "weightedRating",
                     "value": 0
                 }
-            ],
-            "deploymentType": 0
-        }
+            ]
+
+        return data
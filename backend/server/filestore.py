@@ -0,0 +1,81 @@
+"""Bytes derived from extension files, kept on disk across restarts."""
+import os
+import hashlib
+from logging import getLogger
+
+LOGGER = getLogger("app")
+
+
+class FileStore:
+    """Bytes derived from an extension's file (resized icons, compressed
+    assets) are stored in `directory` under the file's identity (path, size
+    and mtime), so each is produced once per file version rather than once
+    per process or cache eviction. Without a directory nothing is kept."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+
+    @staticmethod
+    def digest(extension):
+        stats = extension.stats
+        identity = f"{extension.filename}:{stats.st_size}:{stats.st_mtime_ns}"
+        return hashlib.sha1(identity.encode()).hexdigest()
+
+    def path(self, extension, name):
+        return os.path.join(self.directory, f"{self.digest(extension)}-{name}")
+
+    def get(self, extension, name, produce):
+        """The stored `name` of `extension`, or `produce()` stored."""
+        if self.directory is None:
+            return produce()
+
+        path = self.path(extension, name)
+        try:
+            with open(path, "rb") as stored:
+                return stored.read()
+
+        except FileNotFoundError:
+            pass
+
+        data = produce()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as stored:
+                stored.write(data)
+
+            os.replace(temporary, path)
+
+        except OSError as e:
+            LOGGER.warning(f"Could not store {name} in {self.directory}: {e}")
+
+        return data
+
+    def prune(self, extensions):
+        """Delete what is stored for any file but the current versions of
+        `extensions`. Returns the number of files deleted."""
+        if self.directory is None:
+            return 0
+
+        live = set()
+        for extension in extensions:
+            try:
+                live.add(self.digest(extension))
+            except OSError:
+                pass
+
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        for name in names:
+            if name.partition("-")[0] not in live:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+                except OSError as e:
+                    LOGGER.warning(f"Could not prune {name}: {e}")
+
+        return removed
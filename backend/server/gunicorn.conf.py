@@ -1,9 +1,11 @@
 # pylint: skip-file
+import os
 from main import index_packages
 from logging import getLogger
 
 bind = "0.0.0.0:8443"
-workers = 1
+# Workers share the index through the snapshot the master publishes.
+workers = int(os.environ.get("WORKERS", 1))
 
 def when_ready(server):
     server.log.info("Trying to index packages...")
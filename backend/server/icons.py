@@ -0,0 +1,53 @@
+"""Downscaled extension icons, cached on disk."""
+import io
+from logging import getLogger
+
+from filestore import FileStore
+
+try:
+    from PIL import Image
+
+except ImportError:
+    Image = None
+
+LOGGER = getLogger("app")
+
+
+def thumbnail(data, size):
+    """`data` scaled down to fit a `size` x `size` box, in its own format.
+    The original bytes are returned when they are already small enough,
+    cannot be decoded (e.g. SVG) or when Pillow is not installed."""
+    if Image is None:
+        return data
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image_format = image.format
+        if image.width <= size and image.height <= size:
+            return data
+
+        image.thumbnail((size, size), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format=image_format, optimize=True)
+
+    except Exception as e:
+        LOGGER.warning(f"Could not resize icon: {e}")
+        return data
+
+    resized = output.getvalue()
+    return resized if len(resized) < len(data) else data
+
+
+class IconCache:
+    """Icons resized once per file and size, kept in `directory` (if set)
+    across restarts."""
+
+    def __init__(self, directory=None):
+        self.store = FileStore(directory)
+
+    def get(self, extension, size):
+        if Image is None:
+            return extension.icon
+
+        return self.store.get(extension, str(size),
+                              lambda: thumbnail(extension.icon, size))
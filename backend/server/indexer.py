@@ -1,11 +1,17 @@
 import os
-import re
+import multiprocessing
 from pathlib import Path
 from logging import getLogger
 from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 
-from extension import Extension
+from archive import ARCHIVES
+from extension import Extension, read_metadata
 from extension_pack import ExtensionPack
+from metadata_cache import MetadataCache
+from search import SearchIndex, document_fields, tokenize
+from sorting import SortedIndex, SORTED_ORDERS, RELEVANCE_SORT, \
+    DEFAULT_ORDER, sort_keys, is_descending
 
 LEGAL_CHARS = 'abcdefghijklmnopqrstuvwxyz' \
               'ABCDEFGHIJKLMNOPQRSTUVWXYZ' \
@@ -13,6 +19,13 @@ LEGAL_CHARS = 'abcdefghijklmnopqrstuvwxyz' \
               '.*,-+!@$%^&_ '
 
 
+# Structured `extensionquery` criteria served from hash indexes.
+TAG_FILTER_TYPE = 1
+EXTENSION_ID_FILTER_TYPE = 4
+CATEGORY_FILTER_TYPE = 5
+EXTENSION_NAME_FILTER_TYPE = 7
+
+
 LOGGER = getLogger("app")
 
 
@@ -25,90 +38,290 @@ def ignore_failed_index():
         LOGGER.warning(str(e))
 
 class Trie:
-    def __init__(self):
-        self.next = {}
-        self.values = set()
+    """Compressed (radix) trie over the indexed words.
 
-    def _add(self, element, string, original_string):
-        self.values.add(element)
-        if len(string) == 0:
-            return
+    Nodes live in flat lists indexed by node id: `_edges[node]` maps the
+    first character of each outgoing edge to `(label, child)` and
+    `_values[node]` maps the integer id of each element indexed under that
+    prefix to the number of its words passing through the node, so that
+    removing one word of an element leaves the prefixes its other words
+    share. Every operation is iterative."""
 
-        current_char = string[0]
-        if current_char not in self.next:
-            if current_char not in LEGAL_CHARS:
-                raise RuntimeError(f"Illegal char to add: '{current_char}' in "
-                                   f"'{original_string}'")
-            self.next[current_char] = Trie()
+    ROOT = 0
 
-        self.next[current_char]._add(element, string[1:], original_string)
+    def __init__(self):
+        self._edges = [{}]
+        self._values = [{}]
+        self._free_nodes = []
+
+        self._ids = {}
+        self._elements = {}
+        # Number of nodes whose postings hold each id.
+        self._postings = {}
+        self._next_id = 0
+
+    def __len__(self):
+        """Number of elements indexed."""
+        return len(self._ids)
+
+    def _new_node(self, edges, values):
+        if self._free_nodes:
+            node = self._free_nodes.pop()
+            self._edges[node] = edges
+            self._values[node] = values
+        else:
+            node = len(self._edges)
+            self._edges.append(edges)
+            self._values.append(values)
+
+        for element_id in values:
+            self._postings[element_id] += 1
+
+        return node
+
+    def _post(self, node, element_id):
+        values = self._values[node]
+        count = values.get(element_id, 0)
+        values[element_id] = count + 1
+        if count == 0:
+            self._postings[element_id] += 1
+
+    def _unpost(self, node, element_id):
+        values = self._values[node]
+        count = values.get(element_id, 0)
+        if count > 1:
+            values[element_id] = count - 1
+        elif count == 1:
+            del values[element_id]
+            self._release(element_id)
+
+    def _release(self, element_id):
+        self._postings[element_id] -= 1
+        if self._postings[element_id] == 0:
+            del self._postings[element_id]
+            del self._ids[self._elements.pop(element_id)]
+
+    def _free(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            stack.extend(child for _, child in self._edges[node].values())
+            for element_id in self._values[node]:
+                self._release(element_id)
+
+            self._edges[node] = None
+            self._values[node] = None
+            self._free_nodes.append(node)
+
+    def _element_id(self, element):
+        element_id = self._ids.get(element)
+        if element_id is None:
+            element_id = self._next_id
+            self._next_id += 1
+            self._ids[element] = element_id
+            self._elements[element_id] = element
+            self._postings[element_id] = 0
+
+        return element_id
+
+    @staticmethod
+    def key_of(string):
+        """The part of `string` that is indexed: up to its first illegal
+        char."""
+        illegal = next((index for index, char in enumerate(string)
+                        if char not in LEGAL_CHARS), None)
+        return string if illegal is None else string[:illegal]
 
     def add(self, element, string):
         LOGGER.debug(f"'{string}'")
 
-        self._add(element, string, string)
+        word = self.key_of(string)
+
+        element_id = self._element_id(element)
+        node = self.ROOT
+        self._post(node, element_id)
+        position = 0
+        while position < len(word):
+            edges = self._edges[node]
+            edge = edges.get(word[position])
+            if edge is None:
+                edges[word[position]] = \
+                    (word[position:], self._new_node({}, {element_id: 1}))
+                break
+
+            label, child = edge
+            if not word.startswith(label, position):
+                common = 1
+                while position + common < len(word) and \
+                        label[common] == word[position + common]:
+                    common += 1
+
+                middle = self._new_node({label[common]: (label[common:], child)},
+                                        dict(self._values[child]))
+                edges[word[position]] = (label[:common], middle)
+                label, child = label[:common], middle
+
+            node = child
+            self._post(node, element_id)
+            position += len(label)
+
+        if len(word) < len(string):
+            raise RuntimeError(f"Illegal char to add: '{string[len(word)]}' "
+                               f"in '{string}'")
 
-    def _remove(self, element, string, original_string):
-        if element in self.values:
-            self.values.remove(element)
-
-        if len(string) == 0:
+    def remove(self, element, string):
+        """Undo one `add(element, string)`: only the nodes no other word of
+        `element` passes through drop it."""
+        string = self.key_of(string)
+        element_id = self._ids.get(element)
+        if element_id is None:
             return
 
-        current_char = string[0]
-        if current_char not in self.next:
-            return
+        path = [self.ROOT]
+        position = 0
+        while position < len(string):
+            edge = self._edges[path[-1]].get(string[position])
+            if edge is None or not string.startswith(edge[0], position):
+                break
 
-        self.next[current_char]._remove(element, string[1:], original_string)
-        if len(self.next[current_char].values) == 0:
-            del self.next[current_char]
+            path.append(edge[1])
+            position += len(edge[0])
 
-    def remove(self, element, string):
-        self._remove(element, string, string)
+        for node in path:
+            self._unpost(node, element_id)
+
+        position = 0
+        for parent, child in zip(path, path[1:]):
+            first_char = string[position]
+            position += len(self._edges[parent][first_char][0])
+            if not self._values[child]:
+                del self._edges[parent][first_char]
+                self._free(child)
+                break
 
     def remove_words(self, element, word_list):
         for word in word_list:
-            self.remove(element, word_list)
+            self.remove(element, word)
 
     def add_words(self, element, word_list):
-        successes = []
+        """Index `element` under every word. Returns the keys it was indexed
+        under (see `key_of`), to pass to `remove_words` later."""
+        keys = []
         for word in word_list:
+            keys.append(self.key_of(word))
             with ignore_failed_index():
                 self.add(element, word)
-                successes.append(word)
 
-        return set(successes)
+        return keys
+
+    def references(self):
+        """`{element: number of words it is indexed under}`, read off the
+        root that every word passes through."""
+        return {self._elements[element_id]: count
+                for element_id, count in self._values[self.ROOT].items()}
+
+    def leaves(self):
+        """`{string: elements}` of the longest indexed strings: the ones no
+        other indexed string extends."""
+        leaves = {}
+        stack = [(self.ROOT, "")]
+        while stack:
+            node, string = stack.pop()
+            edges = self._edges[node]
+            if not edges:
+                leaves[string] = {self._elements[element_id]
+                                  for element_id in self._values[node]}
+
+            stack.extend((child, string + label)
+                         for label, child in edges.values())
+
+        return leaves
+
+    def _find(self, string):
+        """The postings of the node `string` leads to, or None."""
+        node = self.ROOT
+        position = 0
+        while position < len(string):
+            edge = self._edges[node].get(string[position])
+            if edge is None:
+                return None
+
+            label, node = edge
+            rest = string[position:position + len(label)]
+            if not label.startswith(rest):
+                return None
+
+            position += len(label)
+
+        return self._values[node]
+
+    def get(self, string):
+        values = self._find(string)
+        if values is None:
+            raise RuntimeError(f"String '{string}' not in trie!")
 
-    def _get(self, string, original_string):
-        if len(string) == 0:
-            return self.values
+        return {self._elements[element_id] for element_id in values}
 
-        current_char = string[0]
-        if current_char not in self.next:
-            raise RuntimeError(f"String '{original_string}' not in trie!")
+    def get_all(self, strings):
+        """Elements indexed under every one of `strings`, intersecting the
+        postings smallest first."""
+        postings = []
+        for string in strings:
+            values = self._find(string)
+            if not values:
+                return set()
 
-        return self.next[current_char]._get(string[1:], original_string)
+            postings.append(values)
 
-    def get(self, string):
-        return self._get(string, string)
+        if not postings:
+            postings.append(self._values[self.ROOT])
+
+        postings.sort(key=len)
+        element_ids = set(postings[0])
+        for values in postings[1:]:
+            element_ids.intersection_update(values)
+            if not element_ids:
+                break
+
+        return {self._elements[element_id] for element_id in element_ids}
 
 
 class Indexer:
-    def __init__(self, start_dir):
+    def __init__(self, start_dir, workers=1, cache_path=None):
         self.start_dir = start_dir
+        self.workers = workers
+        self.metadata_cache = MetadataCache(cache_path) \
+            if cache_path is not None else None
+        # Bumped on every change to the index.
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        self.generation += 1
         self.trie = Trie()
+        self.search_index = SearchIndex()
         self.extensions = {}
 
         self.extension_packs = set()
         self.filename_to_extension_pack = {}
 
-    def reset(self):
-        self.trie = Trie()
-        self.extensions = {}
-        self.extension_packs = set()
-        self.filename_to_extension_pack = {}
+        # filter type -> case folded criteria value -> extension packs
+        self.criteria_indexes = {
+            TAG_FILTER_TYPE: {},
+            EXTENSION_ID_FILTER_TYPE: {},
+            CATEGORY_FILTER_TYPE: {},
+            EXTENSION_NAME_FILTER_TYPE: {}
+        }
+        self.pack_criteria = {}
+        # case folded category -> name as written in the latest manifest
+        self.category_names = {}
+
+        self.sort_indexes = {sort_by: SortedIndex() for sort_by in SORTED_ORDERS}
 
-        self.index_packages()
+        # filename -> (size, mtime) of the indexed files, where known
+        self.stamps = {}
+        # filename -> trie keys its package was indexed under
+        self.package_words = {}
 
     def index_package_in_paths(self, extension):
         if extension.publisher not in self.extensions:
@@ -121,57 +334,348 @@ class Indexer:
             self.extension_packs.add(self.extensions[extension.publisher][extension.name])
 
         extension_pack = self.extensions[extension.publisher][extension.name]
-        extension_pack.add_package(extension)
-        self.filename_to_extension_pack[extension.filename] = extension_pack
+        for replaced in extension_pack.add_package(extension):
+            filename = str(replaced.filename)
+            self.unindex_words(extension_pack, filename)
+            if filename != str(extension.filename):
+                LOGGER.warning(f"{extension.filename} replaces {filename}")
+                del self.filename_to_extension_pack[filename]
+                self.stamps.pop(filename, None)
+
+        self.filename_to_extension_pack[str(extension.filename)] = \
+            extension_pack
         return extension_pack
 
     def index_package(self, extension):
         print(f"Indexing {extension.filename}....", flush=True)
+        self.generation += 1
+        ARCHIVES.discard(extension.filename)
         LOGGER.debug("Keywords: ")
         extension_pack = self.index_package_in_paths(extension)
 
-        index_list = [extension.name]
-        for sub_name in re.split(r"[ \-,_]", extension.name):
-            if len(sub_name) > 0:
-                index_list.append(sub_name)
-
-        index_list.append(extension.publisher)
-        index_list.extend(extension.tags)
+        # The tokens the search index ranks the pack by, so the trie finds
+        # every pack a query term matches as a prefix.
+        index_list = list(dict.fromkeys(
+            token for text in document_fields(extension).values()
+            for token in tokenize(text)))
+        keys = self.trie.add_words(extension_pack, index_list)
+        self.package_words[str(extension.filename)] = keys
+        extension_pack.indexed_by.update(keys)
+        self.refresh_pack(extension_pack)
+
+    def unindex_words(self, extension_pack, filename):
+        """Drop the trie keys of the package read from `filename`, in
+        O(number of its keys)."""
+        keys = self.package_words.pop(filename, ())
+        self.trie.remove_words(extension_pack, keys)
+        extension_pack.indexed_by.subtract(keys)
+        for key in keys:
+            if extension_pack.indexed_by.get(key, 1) <= 0:
+                del extension_pack.indexed_by[key]
+
+    def refresh_pack(self, extension_pack):
+        """Re-index what is derived from the pack's latest version."""
+        latest = extension_pack.latest_package
+        self.search_index.add(
+            extension_pack, document_fields(latest),
+            order=(extension_pack.publisher.casefold(),
+                   extension_pack.name.casefold()))
+
+        self.drop_criteria(extension_pack)
+        criteria = [
+            (EXTENSION_NAME_FILTER_TYPE,
+             f"{extension_pack.publisher}.{extension_pack.name}"),
+            (EXTENSION_ID_FILTER_TYPE, extension_pack.extension_id)
+        ]
+        criteria.extend((CATEGORY_FILTER_TYPE, category)
+                        for category in latest.categories)
+        for category in filter(None, latest.categories):
+            self.category_names[category.casefold()] = category
+
+        criteria.extend((TAG_FILTER_TYPE, tag) for tag in latest.tags)
+        criteria = list(dict.fromkeys(
+            (filter_type, value.casefold())
+            for filter_type, value in criteria if value))
+
+        for filter_type, value in criteria:
+            self.criteria_indexes[filter_type].setdefault(value, set()) \
+                .add(extension_pack)
+
+        self.pack_criteria[extension_pack] = criteria
+
+        for sort_by, key in sort_keys(extension_pack).items():
+            self.sort_indexes[sort_by].add(extension_pack, key)
+
+    def drop_criteria(self, extension_pack):
+        for filter_type, value in self.pack_criteria.pop(extension_pack, ()):
+            index = self.criteria_indexes[filter_type]
+            index[value].discard(extension_pack)
+            if not index[value]:
+                del index[value]
+                if filter_type == CATEGORY_FILTER_TYPE:
+                    del self.category_names[value]
+
+    def category_counts(self, packs):
+        """`Categories` facet of a result: the number of `packs` in each
+        category, read off the category posting sets."""
+        postings = self.criteria_indexes[CATEGORY_FILTER_TYPE]
+        if len(packs) == len(self.extension_packs):
+            # The whole catalog, whose counts are the posting sizes.
+            counts = {key: len(value) for key, value in postings.items()}
+        else:
+            packs = packs if isinstance(packs, (set, frozenset)) else set(packs)
+            counts = {}
+            for key, value in postings.items():
+                smaller, larger = sorted((packs, value), key=len)
+                matched = sum(1 for pack in smaller if pack in larger)
+                if matched:
+                    counts[key] = matched
+
+        return [
+            {
+                "name": self.category_names[key],
+                "count": value
+            }
+            for key, value in counts.items()
+        ]
 
-        index_list.append(extension.display_name)
-        index_list.append(extension.description)
-        for sub_name in re.split(r"[ \-,_]", extension.description):
-            if len(sub_name) > 0:
-                index_list.append(sub_name)
+    def lookup(self, filter_type, value):
+        """Extension packs whose `filter_type` criteria equals `value`."""
+        return self.criteria_indexes[filter_type].get(value.casefold(), set())
 
-        successes = self.trie.add_words(extension_pack, index_list)
-        extension_pack.indexed_by = extension_pack.indexed_by.union(successes)
-    
     def search(self, keyword):
-        return self.trie.get(keyword)
+        """Extension packs matching every term of `keyword` as a prefix, in
+        any of their versions."""
+        return self.trie.get_all(Trie.key_of(term) for term in tokenize(keyword))
+
+    def query(self, text, offset=0, limit=None, within=None,
+              sort_by=RELEVANCE_SORT, sort_order=DEFAULT_ORDER, after=None):
+        """Return `(matches, page, next_key)`: every matching extension pack,
+        the packs from `offset` to `offset + limit` in relevance order (or
+        in the `sort_by` order when a sorted index serves it), and the key
+        to pass as `after` for the next page, None on the last page.
+        `within` restricts the search to a set of packs."""
+        # One extra result tells whether another page follows.
+        fetch = None if limit is None else limit + 1
+        if tokenize(text):
+            # The trie narrows the packs to rank down to the ones with every
+            # term as a prefix of a word, without expanding the terms.
+            found = self.search(text)
+            within = found if within is None else found.intersection(within)
+
+        sort_index = self.sort_indexes.get(sort_by)
+        if sort_index is None:
+            matches, ranked = self.search_index.rank(
+                text, offset=offset, limit=fetch, within=within, after=after)
+            next_key = None
+            if limit is not None and len(ranked) > limit:
+                ranked = ranked[:limit]
+                next_key = ranked[-1][0] if ranked else None
+
+            return matches, [pack for _, pack in ranked], next_key
+
+        descending = is_descending(sort_by, sort_order)
+        if within is None and not tokenize(text):
+            matches = self.extension_packs
+            page = sort_index.page(offset, fetch, descending, after=after)
+        else:
+            matches, _ = self.search_index.search(text, limit=0, within=within)
+            page = sort_index.page(offset, fetch, descending,
+                                   within=set(matches), after=after)
+
+        next_key = None
+        if limit is not None and len(page) > limit:
+            page = page[:limit]
+            next_key = sort_index.key_of(page[-1]) if page else None
+
+        return matches, page, next_key
 
     def remove_package(self, package):
         print(f"Deleting package {package.filename}", flush=True)
-        extension_pack = self.filename_to_extension_pack[package.filename]
-        del self.filename_to_extension_pack[package.filename]
+        self.generation += 1
+        ARCHIVES.discard(package.filename)
+        self.stamps.pop(str(package.filename), None)
+        extension_pack = self.filename_to_extension_pack.pop(
+            str(package.filename))
         extension_pack.remove_package(package)
+        self.unindex_words(extension_pack, str(package.filename))
         if len(extension_pack) == 0:
-            self.trie.remove_words(package, extension_pack.indexed_by)
             self.extension_packs.remove(extension_pack)
+            packs = self.extensions[extension_pack.publisher]
+            del packs[extension_pack.name]
+            if not packs:
+                del self.extensions[extension_pack.publisher]
+
+            self.search_index.remove(extension_pack)
+            self.drop_criteria(extension_pack)
+            for sort_index in self.sort_indexes.values():
+                sort_index.remove(extension_pack)
+        else:
+            self.refresh_pack(extension_pack)
+
+
+    def get_package(self, filename):
+        """The indexed package read from `filename`, or None."""
+        extension_pack = self.filename_to_extension_pack.get(str(filename))
+        if extension_pack is None:
+            return None
+
+        version = extension_pack.filename_to_version[str(filename)]
+        return extension_pack.packages[version]
+
+    def apply_batch(self, indexed=(), removed=()):
+        """Apply a batch of file changes in one pass: drop the packages of
+        `removed` and of changed `indexed` files, then index `indexed`,
+        parsing their manifests across the worker pool."""
+        indexed = [str(filename) for filename in indexed]
+        self.apply_parsed(self.read_packages(indexed), removed)
+
+    def apply_parsed(self, parsed, removed=()):
+        """Apply a batch whose manifests were parsed beforehand, the
+        `(filename, metadata, error)` of `read_packages`: drop the packages
+        of `removed` and of the parsed files, then index the parsed ones.
+        Returns the changed filenames."""
+        parsed = list(parsed)
+        changed = [str(filename) for filename in removed] + \
+            [filename for filename, _, _ in parsed]
+        self.remove_files(changed)
+        self.index_parsed(parsed)
+        return changed
+
+    def sync_records(self, stamps, load_metadata):
+        """Bring the index in line with `stamps`, the `{filename: (size,
+        mtime)}` of another index: drop the files it lacks and (re)index the
+        ones whose stamp differs, with `load_metadata(filename)`. Returns
+        the changed filenames."""
+        removed = [filename for filename in self.filename_to_extension_pack
+                   if filename not in stamps]
+        indexed = [filename for filename, stamp in stamps.items()
+                   if filename not in self.filename_to_extension_pack or
+                   self.stamps.get(filename) != stamp]
+        return self.apply_records(
+            [(filename, *stamps[filename], load_metadata(filename))
+             for filename in indexed], removed)
+
+    def apply_records(self, records, removed=()):
+        """Index the `(filename, size, mtime, metadata)` of `records` and
+        drop the files of `removed`. Returns the changed filenames."""
+        indexed = [filename for filename, _, _, _ in records]
+        removed = list(removed)
+        self.remove_files(removed + indexed)
+        self.index_parsed((filename, metadata, None)
+                          for filename, _, _, metadata in records)
+        for filename, size, mtime, _ in records:
+            self.stamps[filename] = (size, mtime)
+
+        return removed + indexed
+
+    def records(self, filenames=None):
+        """`(filename, size, mtime, metadata)` of the indexed `filenames`,
+        all of them by default."""
+        if filenames is None:
+            filenames = self.filename_to_extension_pack
+
+        records = []
+        for filename in sorted(filenames):
+            stamp = self.stamps.get(filename)
+            if stamp is None:
+                try:
+                    stats = os.stat(filename)
+                    stamp = (stats.st_size, stats.st_mtime_ns)
+                except OSError:
+                    stamp = (0, 0)
+
+                self.stamps[filename] = stamp
+
+            records.append((filename, *stamp,
+                            self.get_package(filename).metadata))
+
+        return records
+
+    def remove_files(self, filenames):
+        for filename in filenames:
+            package = self.get_package(filename)
+            if package is not None:
+                self.remove_package(package)
+
+    def index_parsed(self, parsed):
+        """Index `(filename, metadata, error)` results of the readers."""
+        for filename, metadata, error in parsed:
+            if error is not None:
+                LOGGER.warning(f"Failed to index {filename}: {error}")
+                continue
 
+            try:
+                self.index_package(Extension(filename, metadata=metadata))
+            except Exception as e:
+                LOGGER.warning(f"Failed to index {filename}: {e}")
 
-    def index_packages(self):
-        extensions = [
-            Extension(str(Path(self.start_dir) / package))
+    def read_packages(self, filenames):
+        """Yield `(filename, metadata, error)` for every file, parsing the
+        manifests across a process pool when more than one worker is set."""
+        if self.workers <= 1 or len(filenames) <= 1:
+            yield from map(read_metadata, filenames)
+            return
+
+        chunksize = max(1, len(filenames) // (self.workers * 4))
+        # Spawned, not forked: rebuilds run in a thread of a threaded server.
+        with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")) as executor:
+            yield from executor.map(read_metadata, filenames,
+                                    chunksize=chunksize)
+
+    def read_cached_packages(self, filenames):
+        """Like `read_packages`, but only parses files whose path, size or
+        mtime is missing from the metadata cache, then refreshes it."""
+        if self.metadata_cache is None:
+            yield from self.read_packages(filenames)
+            return
+
+        cached = self.metadata_cache.load()
+        keys = {}
+        misses = []
+        for filename in filenames:
+            try:
+                stats = os.stat(filename)
+            except OSError as e:
+                yield filename, None, str(e)
+                continue
+
+            keys[filename] = (stats.st_size, stats.st_mtime_ns)
+            self.stamps[filename] = keys[filename]
+            entry = cached.get(filename)
+            if entry is not None and entry[:2] == keys[filename]:
+                yield filename, entry[2], None
+            else:
+                misses.append(filename)
+
+        LOGGER.info(f"Metadata cache: {len(keys) - len(misses)} hits, "
+                    f"{len(misses)} misses")
+        parsed = []
+        for filename, metadata, error in self.read_packages(misses):
+            if error is None:
+                parsed.append((filename, *keys[filename], metadata))
+
+            yield filename, metadata, error
+
+        self.metadata_cache.update(parsed, existing=keys)
+
+    def index_packages(self, progress=None):
+        """Index every file in `start_dir`, calling `progress(done, total)`
+        (if given) after each file."""
+        filenames = [
+            str(Path(self.start_dir) / package)
             for package in os.listdir(self.start_dir)
         ]
 
-        for extension in extensions:
-            try:
-                self.index_package(extension)
-            except Exception as e:
-                LOGGER.warning(
-                    f"Failed to index {extension.filename}: {e}")
+        def counted(parsed):
+            for done, item in enumerate(parsed, 1):
+                yield item
+                progress(done, len(filenames))
+
+        parsed = self.read_cached_packages(filenames)
+        self.index_parsed(parsed if progress is None else counted(parsed))
 
     def get_extension(self, publisher, name, version):
         return self.extensions[publisher][name][version]
@@ -0,0 +1,28 @@
+"""Blocking loads (archive reads, manifest parsing, stat calls) run off the
+event loop."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncLoader:
+    """Runs blocking loaders on a bounded thread pool. Loads are single
+    flight: while one runs for a key, other callers of that key await its
+    result instead of starting their own."""
+
+    def __init__(self, max_workers):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._in_flight = {}
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    async def load(self, key, loader):
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.get_event_loop().run_in_executor(self.executor,
+                                                              loader)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # A cancelled caller must not cancel the load for the others.
+        return await asyncio.shield(future)
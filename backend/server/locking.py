@@ -0,0 +1,50 @@
+"""Readers-writer lock guarding the index within a process."""
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """Any number of readers at once, or one writer. A waiting writer goes
+    before new readers, so a steady stream of queries cannot hold back an
+    index change. Not reentrant."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def reading(self):
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+
+            self._readers += 1
+
+        try:
+            yield
+
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def writing(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+
+            self._waiting_writers -= 1
+            self._writing = True
+
+        try:
+            yield
+
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
@@ -1,10 +1,13 @@
 
-import json
+import os
+import asyncio
+import threading
 from enum import Enum
-from typing import List
+from typing import List, Optional
 from pathlib import Path
+from contextlib import contextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.openapi.docs import (
     get_redoc_html,
     get_swagger_ui_html,
@@ -13,11 +16,24 @@ from fastapi.openapi.docs import (
 from pydantic import BaseModel, Schema
 from starlette.requests import Request
 from starlette.staticfiles import StaticFiles
-from starlette.responses import FileResponse, Response, RedirectResponse, HTMLResponse
+from starlette.responses import Response, RedirectResponse, HTMLResponse
 
+from cache import LRUCache
+from archive import ARCHIVES
 from indexer import Indexer
-from controller import count
-from extension import Extension
+from locking import ReadWriteLock
+from snapshot import SnapshotStore
+from rebuild import BackgroundRebuild
+from consistency import check_index
+from paging import Cursor, encode_token, decode_token, query_digest
+from sorting import is_descending, valid_key
+from responses import asset_response, negotiate_encoding, compress
+from controller import match_criteria, query_response
+from icons import IconCache
+from filestore import FileStore
+from loading import AsyncLoader
+from extension import ICON, ICON_SMALL, MANIFEST, DETAILS, LICENSE, \
+    RENDERED_QUERY_FLAGS
 
 
 app = FastAPI(title="VSCode Extensions Server", version="0.3.1",
@@ -25,11 +41,293 @@ app = FastAPI(title="VSCode Extensions Server", version="0.3.1",
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 TEXT_FILTER_TYPE = 10
+DEFAULT_FLAGS = 914
+
+INDEX_WORKERS = int(os.environ.get("INDEX_WORKERS", os.cpu_count() or 1))
+
+METADATA_CACHE = os.environ.get("METADATA_CACHE", "/app/metadata_cache.sqlite")
+
+INDEXER = Indexer("/app/exts", workers=INDEX_WORKERS,
+                  cache_path=METADATA_CACHE)
+
+ASSET_CACHE_BYTES = int(os.environ.get("ASSET_CACHE_BYTES", 128 * 1024 * 1024))
+
+ASSET_CACHE = LRUCache(max_bytes=ASSET_CACHE_BYTES)
+
+QUERY_CACHE_BYTES = int(os.environ.get("QUERY_CACHE_BYTES", 32 * 1024 * 1024))
+
+QUERY_CACHE = LRUCache(max_bytes=QUERY_CACHE_BYTES)
+
+# "redirect" leaves package downloads to the nginx sidecar, "native" sends
+# them from here.
+SERVE_MODE = os.environ.get("SERVE_MODE", "redirect")
+
+# Stored (uncompressed) assets from this size up are streamed from the
+# package instead of being read into memory and cached.
+STREAM_MIN_BYTES = int(os.environ.get("STREAM_MIN_BYTES", 1024 * 1024))
+
+# Threads for blocking archive reads, so they never stall the event loop.
+ASSET_WORKERS = int(os.environ.get("ASSET_WORKERS", 8))
+
+ASSET_LOADER = AsyncLoader(max_workers=ASSET_WORKERS)
+
+ICON_CACHE_DIR = os.environ.get("ICON_CACHE_DIR", "/app/icon_cache")
+
+ICON_SIZES = {
+    ICON: int(os.environ.get("ICON_SIZE", 256)),
+    ICON_SMALL: int(os.environ.get("SMALL_ICON_SIZE", 64))
+}
+
+ICONS = IconCache(ICON_CACHE_DIR)
+
+# Assets compressed at the best levels are kept here, so they are not
+# compressed again when they drop out of the asset cache.
+COMPRESSED_CACHE_DIR = os.environ.get("COMPRESSED_CACHE_DIR",
+                                      "/app/compressed_cache")
+
+COMPRESSED_ASSETS = FileStore(COMPRESSED_CACHE_DIR)
+
+QUERY_COMPRESSION_LEVELS = {
+    "gzip": int(os.environ.get("QUERY_GZIP_LEVEL", 6)),
+    "br": int(os.environ.get("QUERY_BROTLI_QUALITY", 5))
+}
+
+# Index snapshot the server processes share, so a change indexed by one
+# worker reaches the others. Off by default with a single worker.
+SNAPSHOT_PATH = os.environ.get(
+    "SNAPSHOT_PATH",
+    "/app/index_snapshot.bin" if int(os.environ.get("WORKERS", 1)) > 1
+    else "")
+
+SNAPSHOT_POLL_SECONDS = float(os.environ.get("SNAPSHOT_POLL_SECONDS", 1))
+
+SNAPSHOT = SnapshotStore(SNAPSHOT_PATH, poll_seconds=SNAPSHOT_POLL_SECONDS) \
+    if SNAPSHOT_PATH else None
+
+# Serializes index changes within the process.
+INDEX_LOCK = threading.Lock()
+
+# Queries read the index under `reading()`; incremental changes are applied
+# to it in place under `writing()`. Rebuilds are swapped in whole.
+INDEX_ACCESS = ReadWriteLock()
+
+# Held while this process catches up with the snapshot.
+FOLLOWING = threading.Lock()
+
+# With a snapshot, the workers share one rebuild and its status.
+REBUILD = BackgroundRebuild(f"{SNAPSHOT_PATH}.rebuild"
+                            if SNAPSHOT_PATH else None)
+
+
+def files_changed(filenames):
+    """Forget what was cached for files whose packages changed."""
+    filenames = set(filenames)
+    if filenames:
+        ASSET_CACHE.discard(lambda key: key[0] in filenames)
+        REBUILD.touch(filenames)
+
+
+@contextmanager
+def publishing():
+    """Hold the snapshot for writing, across processes."""
+    if SNAPSHOT is None:
+        yield
+        return
+
+    with SNAPSHOT.locked():
+        yield
+
+
+def follow_snapshot():
+    """Catch up with the index changes other processes published, unless
+    another thread already is."""
+    if not FOLLOWING.acquire(blocking=False):
+        return
+
+    try:
+        if not SNAPSHOT.pending():
+            return
+
+        with INDEX_LOCK:
+            with INDEX_ACCESS.writing():
+                changed = SNAPSHOT.sync(INDEXER)
+
+            files_changed(changed)
+
+    finally:
+        FOLLOWING.release()
+
+
+def change_index(parsed, removed):
+    """Apply a batch of changes, parsed by `Indexer.read_packages`, to the
+    index on top of the changes other processes published, then publish
+    it."""
+    with INDEX_LOCK, publishing():
+        with INDEX_ACCESS.writing():
+            synced = SNAPSHOT.sync(INDEXER) if SNAPSHOT is not None else []
+            changed = INDEXER.apply_parsed(parsed, removed)
+
+        files_changed(synced + changed)
+        if SNAPSHOT is not None:
+            SNAPSHOT.publish(INDEXER, changed)
+
+
+def prune_stores():
+    """Delete the stored icons and compressed assets of files that are no
+    longer indexed."""
+    with INDEX_ACCESS.reading():
+        extensions = [package for pack in INDEXER.extension_packs
+                      for package in pack.packages.values()]
+
+    for store in (ICONS.store, COMPRESSED_ASSETS):
+        removed = store.prune(extensions)
+        if removed:
+            print(f"Pruned {removed} files from {store.directory}", flush=True)
 
-INDEXER = Indexer("/app/exts")
 
 def index_packages():
-    INDEXER.index_packages()
+    with INDEX_LOCK, publishing():
+        with INDEX_ACCESS.writing():
+            INDEXER.index_packages()
+
+        if SNAPSHOT is not None:
+            SNAPSHOT.publish(INDEXER)
+
+    prune_stores()
+
+
+def build_index(progress):
+    fresh = Indexer(INDEXER.start_dir, workers=INDEX_WORKERS,
+                    cache_path=METADATA_CACHE)
+    fresh.index_packages(progress=progress)
+    return fresh
+
+
+def swap_index(fresh, take_touched):
+    """Replay the changes made while `fresh` was built, then make it the
+    index. Requests that already hold the old index finish with it."""
+    global INDEXER
+    with INDEX_LOCK, publishing():
+        if SNAPSHOT is not None:
+            # Touches what others changed, so it is read again below.
+            files_changed(SNAPSHOT.sync(fresh))
+
+        touched = take_touched()
+        fresh.apply_batch(
+            indexed=[filename for filename in touched
+                     if os.path.exists(filename)],
+            removed=[filename for filename in touched
+                     if not os.path.exists(filename)])
+        # Keep generations increasing across the swap.
+        fresh.generation += INDEXER.generation + 1
+        INDEXER = fresh
+        ASSET_CACHE.clear()
+        QUERY_CACHE.clear()
+        if SNAPSHOT is not None:
+            SNAPSHOT.publish(fresh)
+
+    prune_stores()
+
+
+class SnapshotMiddleware:
+    """Starts catching up with a newer index snapshot, at most every
+    `SNAPSHOT_POLL_SECONDS`. The request goes on meanwhile, with the index
+    as it is."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and SNAPSHOT is not None and \
+                SNAPSHOT.due() and not FOLLOWING.locked():
+            asyncio.get_event_loop().run_in_executor(None, follow_snapshot)
+
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(SnapshotMiddleware)
+
+
+def asset_key(extension, asset_type, encoding=None):
+    key = (str(extension.filename), asset_type)
+    return key if encoding is None else key + (encoding,)
+
+
+def read_asset(extension, asset_type, encoding=None):
+    """Asset bytes in the given content encoding. Each encoding is produced
+    once per file, stored on disk and cached next to the plain bytes."""
+    if encoding is not None:
+        return ASSET_CACHE.get(
+            asset_key(extension, asset_type, encoding),
+            lambda: COMPRESSED_ASSETS.get(
+                extension, f"{asset_type}.{encoding}",
+                lambda: compress(read_asset(extension, asset_type),
+                                 encoding)))
+
+    if asset_type in ICON_SIZES:
+        return ASSET_CACHE.get(
+            asset_key(extension, asset_type),
+            lambda: ICONS.get(extension, ICON_SIZES[asset_type]))
+
+    return ASSET_CACHE.get(asset_key(extension, asset_type),
+                           lambda: extension.read_asset(asset_type))
+
+
+async def load_asset(extension, asset_type, encoding=None):
+    """`read_asset` on the asset threads; cached assets are returned
+    without leaving the event loop."""
+    key = asset_key(extension, asset_type, encoding)
+    content = ASSET_CACHE.lookup(key) if key in ASSET_CACHE else None
+    if content is None:
+        content = await ASSET_LOADER.load(
+            key, lambda: read_asset(extension, asset_type, encoding))
+
+    return content
+
+
+def stream_span(extension, asset_type):
+    """Where a large stored asset lies in the package, if it does."""
+    span = ARCHIVES.stored_span(extension.filename,
+                                extension.asset_path(asset_type))
+    if span is None or span[1] < STREAM_MIN_BYTES:
+        return None
+
+    return span
+
+
+async def send_asset(request, extension, asset_type, media_type,
+                     compressible=False):
+    filename = str(extension.filename)
+    stats = await ASSET_LOADER.load((filename, "stat"),
+                                    lambda: extension.stats)
+    span = None
+    # Assets already in the cache are not the large ones that are streamed.
+    if compressible and asset_key(extension, asset_type) not in ASSET_CACHE:
+        span = await ASSET_LOADER.load(
+            (filename, asset_type, "span"),
+            lambda: stream_span(extension, asset_type))
+
+    return await asset_response(
+        request, extension, stats,
+        lambda encoding: load_asset(extension, asset_type, encoding),
+        media_type=media_type, compressible=compressible and span is None,
+        span=span, variant=ICON_SIZES.get(asset_type))
+
+
+def query_content(key, encoding, load):
+    """Query response bytes, cached per content encoding."""
+    content = QUERY_CACHE.lookup(key + (encoding,))
+    if content is None:
+        if encoding is None:
+            content = load()
+        else:
+            content = compress(query_content(key, None, load), encoding,
+                               QUERY_COMPRESSION_LEVELS[encoding])
+
+        QUERY_CACHE.put(key + (encoding,), content)
+
+    return content
+
 
 def get_text_filter(criterias):
     for criteria in criterias:
@@ -39,6 +337,21 @@ def get_text_filter(criterias):
     return ""
 
 
+def normalized_criteria(criterias):
+    return tuple(sorted({(criteria.filterType, criteria.value.casefold())
+                         for criteria in criterias}))
+
+
+def query_key(criterias, page_number, page_size, sort_by, sort_order, flags,
+              paging_token):
+    """Response cache key of a query. Criteria order and case (which the
+    indexes ignore) and flags that do not change the output are left out."""
+    criteria = normalized_criteria(criterias)
+    return (get_text_filter(criterias).casefold(), criteria, page_number,
+            page_size, sort_by, sort_order, flags & RENDERED_QUERY_FLAGS,
+            paging_token)
+
+
 @app.get("/redoc", include_in_schema=False)
 async def redoc_html(req: Request) -> HTMLResponse:
     openapi_url = app.openapi_prefix + app.openapi_url
@@ -67,40 +380,65 @@ async def swagger_ui_html(req: Request) -> HTMLResponse:
 
 @app.get("/extensions/{publisher}/{package}/{version}/Microsoft.VisualStudio.Services.Icons.Default", 
          operation_id="getIcon", responses={200: {'content': {'image/png': {}}}})
-async def get_package_icon(publisher: str, package: str, version: str):
+async def get_package_icon(publisher: str, package: str, version: str,
+                           request: Request):
+    extension = INDEXER.get_extension(publisher, package, version)
+    return await send_asset(request, extension, ICON,
+                            media_type=f'image/{Path(extension.icon_path).suffix[1:]}')
+
+
+@app.get("/extensions/{publisher}/{package}/{version}/Microsoft.VisualStudio.Services.Icons.Small",
+         operation_id="getSmallIcon", responses={200: {'content': {'image/png': {}}}})
+async def get_package_small_icon(publisher: str, package: str, version: str,
+                                 request: Request):
     extension = INDEXER.get_extension(publisher, package, version)
-    return Response(content=extension.icon,
-                    media_type=f'image/{Path(extension.icon_path).suffix[1:]}')
+    return await send_asset(request, extension, ICON_SMALL,
+                            media_type=f'image/{Path(extension.icon_path).suffix[1:]}')
 
 
 @app.get("/extensions/{publisher}/{package}/{version}/Microsoft.VisualStudio.Code.Manifest",
-         operation_id="getManifest")
-async def get_package_manifest(publisher: str, package: str, version: str):
+         operation_id="getManifest", responses={200: {'content': {'application/json': {}}}})
+async def get_package_manifest(publisher: str, package: str, version: str,
+                               request: Request):
     extension = INDEXER.get_extension(publisher, package, version)
-    return json.loads(extension.code_manifest)
+    return await send_asset(request, extension, MANIFEST,
+                            media_type="application/json", compressible=True)
 
 
 @app.get("/extensions/{publisher}/{package}/{version}/Microsoft.VisualStudio.Services.Content.Details",
          operation_id="getDetails", responses={200: {'content': {'text/markdown': {}}}})
-async def get_package_details(publisher: str, package: str, version: str):
+async def get_package_details(publisher: str, package: str, version: str,
+                              request: Request):
     extension = INDEXER.get_extension(publisher, package, version)
-    return Response(content=extension.details,
-                    media_type="text/markdown")
+    return await send_asset(request, extension, DETAILS,
+                            media_type="text/markdown", compressible=True)
 
 
 @app.get("/extensions/{publisher}/{package}/{version}/Microsoft.VisualStudio.Services.Content.License",
          operation_id="getLicense", responses={200: {'content': {'plain/text': {}}}})
-async def get_package_license(publisher: str, package: str, version: str):
+async def get_package_license(publisher: str, package: str, version: str,
+                              request: Request):
     extension = INDEXER.get_extension(publisher, package, version)
-    return extension.license
+    return await send_asset(request, extension, LICENSE,
+                            media_type="text/plain", compressible=True)
 
 @app.get("/extensions/{publisher}/{package}/{version}/Microsoft.VisualStudio.Services.VSIXPackage",
          operation_id="getPackage")
-async def get_package(publisher: str, package: str, version: str):
+async def get_package(publisher: str, package: str, version: str,
+                      request: Request):
     extension = INDEXER.get_extension(publisher, package, version)
     print(extension.filename, flush=True)
-    return RedirectResponse(url=f'/serve{extension.filename}')
-    # FileResponse(extension.filename, media_type="application/zip", filename='Microsoft.VisualStudio.Services.VSIXPackage')
+    if SERVE_MODE != "native":
+        return RedirectResponse(url=f'/serve{extension.filename}')
+
+    stats = await ASSET_LOADER.load((str(extension.filename), "stat"),
+                                    lambda: extension.stats)
+    response = await asset_response(request, extension, stats, None,
+                                    media_type="application/zip",
+                                    span=(0, stats.st_size))
+    response.headers["Content-Disposition"] = \
+        'attachment; filename="Microsoft.VisualStudio.Services.VSIXPackage"'
+    return response
 
 
 class CriteriaModel(BaseModel):
@@ -113,63 +451,120 @@ class FilterModel(BaseModel):
     sortBy: int = 0
     sortOrder: int = 0
     criteria: List[CriteriaModel] = [CriteriaModel()]
-    flags: int = 914
+    flags: Optional[int] = None
+    pagingToken: str = None
 
 class QueryModel(BaseModel):
     filters: List[FilterModel] = Schema([FilterModel()], min_items=1, max_items=1)
+    flags: Optional[int] = None
+
+    @property
+    def resolved_flags(self):
+        """The query's flags, else the filter's, else `DEFAULT_FLAGS`."""
+        for flags in [self.flags] + [query_filter.flags
+                                     for query_filter in self.filters[:1]]:
+            if flags is not None:
+                return flags
+
+        return DEFAULT_FLAGS
 
 
 @app.post("/_apis/public/gallery/extensionquery", 
           operation_id="queryExtensions")
-def query_extentions(query: QueryModel):
+def query_extentions(query: QueryModel, request: Request):
     if len(query.filters) == 0:
-        text_filter = ""
+        criteria = []
         page_size = 50
         page_number = 1
+        sort_by = 0
+        sort_order = 0
+        paging_token = None
 
     else:
         main_filter = query.filters[0]
+        criteria = main_filter.criteria
         page_number = main_filter.pageNumber
         page_size = main_filter.pageSize
-        text_filter = get_text_filter(main_filter.criteria)
-    
-    try:
-        exts = INDEXER.search(text_filter)
-
-    except:
-        exts = []
-
-    to_display = list(exts)[0 + page_size * (page_number - 1):
-                      page_size + page_size * (page_number - 1)]
-
-    return {
-        "results": [
-            {
-                "extensions": [ext.query_data for ext in to_display],
-                "pagingToken": None,
-                "resultMetadata": [
-                    {
-                        "metadataType": "ResultCount",
-                        "metadataItems": [
-                            {
-                                "name": "TotalCount",
-                                "count": len(exts)
-                            }
-                        ]
-                    },
-                    {
-                        "metadataType": "Categories",
-                        "metadataItems": count(exts)
-                    }
-                ]
-            }
-        ]
-    }
+        sort_by = main_filter.sortBy
+        sort_order = main_filter.sortOrder
+        paging_token = main_filter.pagingToken
+
+    flags = query.resolved_flags
+
+    def load(indexer, generation):
+        text_filter = get_text_filter(criteria)
+        within = match_criteria(indexer, criteria)
+        descending = is_descending(sort_by, sort_order)
+        position = page_size * (page_number - 1)
+        after = None
+        # Tokens carry the query they page through, so one cannot be
+        # replayed against another query.
+        digest = query_digest([text_filter.casefold(),
+                               normalized_criteria(criteria), sort_by,
+                               descending])
+        if paging_token:
+            cursor = decode_token(paging_token)
+            if cursor is None or cursor.query != digest or \
+                    not valid_key(cursor.key, sort_by):
+                raise HTTPException(status_code=400,
+                                    detail="Invalid pagingToken for this query")
+
+            position = cursor.position
+            # Sort keys of the sorted indexes survive index changes,
+            # relevance scores do not: after a change those fall back to
+            # the position.
+            if cursor.generation == generation or \
+                    sort_by in indexer.sort_indexes:
+                after = cursor.key
+
+        exts, to_display, next_key = indexer.query(
+            text_filter, offset=0 if after is not None else position,
+            limit=page_size, within=within, sort_by=sort_by,
+            sort_order=sort_order, after=after)
+
+        next_token = None
+        if next_key is not None:
+            next_token = encode_token(Cursor(generation,
+                                             position + len(to_display),
+                                             digest, next_key))
+
+        return query_response(to_display, len(exts),
+                              indexer.category_counts(exts), flags,
+                              paging_token=next_token)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+
+    # Index changes wait until the response is built, so it matches the
+    # generation it is cached under.
+    with INDEX_ACCESS.reading():
+        # One index for the whole request, even if a rebuild swaps it
+        # meanwhile.
+        indexer = INDEXER
+        generation = indexer.generation
+        # Any index change bumps the generation, so older entries are never
+        # hit again and age out of the LRU.
+        key = (generation,) + query_key(criteria, page_number, page_size,
+                                        sort_by, sort_order, flags,
+                                        paging_token)
+        content = query_content(key, encoding,
+                                lambda: load(indexer, generation))
+
+    return Response(content=content, media_type="application/json",
+                    headers=headers)
 
 
 class AcceptedTypes(str, Enum):
     in_close_write = "IN_CLOSE_WRITE"
     in_delete = "IN_DELETE"
+    in_moved_to = "IN_MOVED_TO"
+    in_moved_from = "IN_MOVED_FROM"
+
+
+INDEX_EVENTS = {AcceptedTypes.in_close_write, AcceptedTypes.in_moved_to}
+DELETE_EVENTS = {AcceptedTypes.in_delete, AcceptedTypes.in_moved_from}
 
 
 class Update(BaseModel):
@@ -178,29 +573,75 @@ class Update(BaseModel):
     type_names: List[AcceptedTypes] = ["IN_CLOSE_WRITE"]
 
 
+class BatchUpdate(BaseModel):
+    updates: List[Update]
+
+
 class StatusResponse(BaseModel):
     status: str
 
 
+def apply_updates(updates):
+    """Apply file events in order; the last event of a file decides whether
+    it is indexed or removed."""
+    changes = {}
+    for update in updates:
+        filename = str(Path(update.path) / update.filename)
+        if DELETE_EVENTS.intersection(update.type_names):
+            changes[filename] = False
+        elif INDEX_EVENTS.intersection(update.type_names):
+            changes[filename] = True
+
+    # Parsed before taking any lock, so queries only wait for the indexing.
+    parsed = list(INDEXER.read_packages(
+        [filename for filename, index in changes.items() if index]))
+    change_index(parsed, [filename for filename, index in changes.items()
+                          if not index])
+
+
 @app.post('/index_new', response_model=StatusResponse,
           operation_id="indexExtension")
 def index_new_extension(update: Update):
     """Force Indexing new extension"""
-    ext = Extension(Path(update.path) / update.filename)
-    if "IN_CLOSE_WRITE" in update.type_names:
-        INDEXER.index_package(ext)
-
-    if "IN_DELETE" in update.type_names:
-        if ext not in INDEXER.filename_to_extension_pack:
-            return {"status": "OK"}
+    apply_updates([update])
+    return {"status": "OK"}
 
-        INDEXER.remove_package(ext)  # get actual copy
 
+@app.post('/index_batch', response_model=StatusResponse,
+          operation_id="indexExtensions")
+def index_extensions_batch(batch: BatchUpdate):
+    """Index and remove a batch of extensions in one pass"""
+    apply_updates(batch.updates)
     return {"status": "OK"}
 
 
 @app.post("/reset_index", response_model=StatusResponse)
 def reset_indexes():
-    """Reset all indexes"""
-    INDEXER.reset()
-    return {"status": "OK"}
+    """Rebuild all indexes in the background; the current ones keep
+    serving until the new ones replace them"""
+    if not REBUILD.start(build_index, swap_index):
+        return {"status": "already running"}
+
+    return {"status": "started"}
+
+
+@app.get("/reset_index", operation_id="getResetStatus")
+def get_reset_status():
+    """Progress of the last index rebuild"""
+    return REBUILD.status
+
+
+@app.get("/check_index", operation_id="checkIndex")
+def check_indexes():
+    """Compare the incrementally maintained index with a rebuild of the
+    same packages"""
+    # Only reading the index holds up its changes, not the rebuild.
+    differences = check_index(INDEXER, hold=INDEX_ACCESS.reading)
+
+    return {"consistent": not differences, "differences": differences}
+
+
+@app.get("/stats", operation_id="getStats")
+def get_stats():
+    """Asset and query response cache counters"""
+    return {"assets": ASSET_CACHE.stats, "queries": QUERY_CACHE.stats}
@@ -0,0 +1,76 @@
+"""Typed model of `extension.vsixmanifest`."""
+from typing import Dict, List, Optional
+from dataclasses import dataclass
+from xml.etree import ElementTree
+
+
+def _local_name(tag):
+    return tag.rpartition("}")[2].lower()
+
+
+def _attributes(element):
+    return {_local_name(key): value for key, value in element.attrib.items()}
+
+
+def _text(element):
+    if element is None:
+        return None
+
+    return "".join(element.itertext())
+
+
+def _split(text):
+    return text.split(",") if text else []
+
+
+@dataclass
+class Manifest:
+    """The subset of the VSIX manifest the server uses. Parsed once per
+    file; the XML tree is discarded right after."""
+    __slots__ = ("publisher", "name", "version", "display_name",
+                 "description", "icon_path", "tags", "categories",
+                 "properties", "assets")
+
+    publisher: str
+    name: str
+    version: str
+    display_name: Optional[str]
+    description: str
+    icon_path: Optional[str]
+    tags: List[str]
+    categories: List[str]
+    properties: Dict[str, str]
+    assets: Dict[str, str]
+
+    @classmethod
+    def parse(cls, data):
+        root = ElementTree.fromstring(data)
+        sections = {_local_name(child.tag): child for child in root}
+        metadata = {
+            _local_name(child.tag): child
+            for child in sections.get("metadata", ())
+        }
+        identity = _attributes(metadata["identity"])
+
+        properties = {}
+        for element in metadata.get("properties", ()):
+            attributes = _attributes(element)
+            properties[attributes["id"]] = attributes["value"]
+
+        assets = {}
+        for element in sections.get("assets", ()):
+            attributes = _attributes(element)
+            assets[attributes["type"]] = attributes["path"]
+
+        return cls(
+            publisher=identity["publisher"],
+            name=identity["id"],
+            version=identity["version"],
+            display_name=_text(metadata.get("displayname")),
+            description=_text(metadata.get("description")) or "",
+            icon_path=_text(metadata.get("icon")),
+            tags=_split(_text(metadata.get("tags"))),
+            categories=_split(_text(metadata.get("categories"))),
+            properties=properties,
+            assets=assets
+        )
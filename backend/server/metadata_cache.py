@@ -0,0 +1,72 @@
+"""Persistent cache of parsed extension metadata."""
+import json
+import sqlite3
+from logging import getLogger
+from dataclasses import asdict
+from contextlib import closing
+
+from manifest import Manifest
+
+LOGGER = getLogger("app")
+
+# Bump whenever the shape of the metadata records changes.
+SCHEMA_VERSION = 2
+
+
+class MetadataCache:
+    """Parsed manifest records stored in SQLite, keyed by the file path and
+    valid only while the file's size and mtime are unchanged."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            connection.execute("DROP TABLE IF EXISTS metadata")
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        connection.execute("CREATE TABLE IF NOT EXISTS metadata ("
+                           "filename TEXT PRIMARY KEY, "
+                           "size INTEGER NOT NULL, "
+                           "mtime INTEGER NOT NULL, "
+                           "metadata TEXT NOT NULL)")
+        return connection
+
+    def load(self):
+        """Return `{filename: (size, mtime, metadata)}` for every entry."""
+        try:
+            with closing(self._connect()) as connection:
+                rows = connection.execute(
+                    "SELECT filename, size, mtime, metadata FROM metadata")
+                return {
+                    filename: (size, mtime, Manifest(**json.loads(metadata)))
+                    for filename, size, mtime, metadata in rows
+                }
+
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            LOGGER.warning(f"Failed to load metadata cache {self.path}: {e}")
+            return {}
+
+    def update(self, entries, existing):
+        """Store `(filename, size, mtime, metadata)` entries and drop every
+        row whose filename is not in `existing`."""
+        try:
+            with closing(self._connect()) as connection:
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)",
+                        [(filename, size, mtime, json.dumps(asdict(metadata)))
+                         for filename, size, mtime, metadata in entries])
+
+                    stale = [
+                        (filename,) for (filename,) in
+                        connection.execute("SELECT filename FROM metadata")
+                        if filename not in existing
+                    ]
+                    connection.executemany(
+                        "DELETE FROM metadata WHERE filename = ?", stale)
+
+        except sqlite3.Error as e:
+            LOGGER.warning(f"Failed to update metadata cache {self.path}: {e}")
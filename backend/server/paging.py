@@ -0,0 +1,39 @@
+"""Opaque `pagingToken` cursors for `extensionquery`."""
+import json
+import base64
+import hashlib
+import binascii
+from collections import namedtuple
+
+# `key` is the sort key of the last result served and `position` the
+# number of results served so far, at index `generation`, for the query
+# whose `query_digest` is `query`.
+Cursor = namedtuple("Cursor", ["generation", "position", "query", "key"])
+
+
+def query_digest(query):
+    """Digest of a normalized query (any JSON serializable value), to tell
+    whether a token was issued for it."""
+    data = json.dumps(query, separators=(",", ":"))
+    return hashlib.sha1(data.encode()).hexdigest()[:16]
+
+
+def encode_token(cursor):
+    data = json.dumps([cursor.generation, cursor.position, cursor.query,
+                       list(cursor.key)],
+                      separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_token(token):
+    """The cursor encoded in `token`, or None if it is not a valid token."""
+    try:
+        generation, position, query, key = \
+            json.loads(base64.urlsafe_b64decode(token.encode()))
+        if not all(isinstance(value, (str, int, float)) for value in key):
+            return None
+
+        return Cursor(int(generation), int(position), str(query), tuple(key))
+
+    except (ValueError, TypeError, binascii.Error):
+        return None
@@ -0,0 +1,165 @@
+"""Index rebuilds in the background, while the current index keeps
+serving."""
+import os
+import json
+import time
+import fcntl
+import threading
+from datetime import datetime, timezone
+from logging import getLogger
+
+LOGGER = getLogger("app")
+
+IDLE = "idle"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# How often the progress of a rebuild is written for other processes.
+STATUS_SAVE_SECONDS = 0.5
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds") \
+        .replace("+00:00", "Z")
+
+
+class BackgroundRebuild:
+    """Runs `build(progress)` in a thread to make a fresh index, then hands
+    it to `swap(fresh, take_touched)`. `take_touched()` returns the files
+    that changed in the live index meanwhile (see `touch`), which are still
+    to be replayed onto the fresh one. Only one rebuild runs at a time.
+
+    With a `state_path`, that holds across processes too: a rebuild holds
+    an flock on `{state_path}.lock`, and its status is written to
+    `state_path` for every process to report."""
+
+    def __init__(self, state_path=None):
+        self.state = IDLE
+        self.indexed = 0
+        self.total = 0
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.state_path = state_path
+        self._touched = set()
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._saved = 0.0
+
+    @property
+    def running(self):
+        return self.state == RUNNING
+
+    def _open_lock(self):
+        """The rebuild lock file, locked, or None if a rebuild holds it."""
+        fd = os.open(f"{self.state_path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+
+        return fd
+
+    def start(self, build, swap):
+        """Start a rebuild; False if one is already running."""
+        with self._lock:
+            if self.running:
+                return False
+
+            if self.state_path is not None:
+                self._lock_fd = self._open_lock()
+                if self._lock_fd is None:
+                    return False
+
+            self.state = RUNNING
+            self.indexed = self.total = 0
+            self.started = _now()
+            self.finished = self.error = None
+            self._touched = set()
+            self._save()
+
+        threading.Thread(target=self._run, args=(build, swap),
+                         name="index-rebuild", daemon=True).start()
+        return True
+
+    def touch(self, filenames):
+        """Record files changed in the live index during a rebuild."""
+        with self._lock:
+            if self.running:
+                self._touched.update(filenames)
+
+    def take_touched(self):
+        with self._lock:
+            touched, self._touched = self._touched, set()
+            return touched
+
+    def progress(self, indexed, total):
+        self.indexed = indexed
+        self.total = total
+        if time.monotonic() - self._saved >= STATUS_SAVE_SECONDS:
+            self._save()
+
+    def _run(self, build, swap):
+        try:
+            swap(build(self.progress), self.take_touched)
+            state = DONE
+
+        except Exception as e:
+            LOGGER.exception("Index rebuild failed")
+            self.error = str(e)
+            state = FAILED
+
+        with self._lock:
+            self.state = state
+            self.finished = _now()
+            # Saved before unlocking, so a free lock never goes with a
+            # running status.
+            self._save()
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    def _save(self):
+        if self.state_path is None:
+            return
+
+        self._saved = time.monotonic()
+        temporary = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self._status(), file)
+
+        os.replace(temporary, self.state_path)
+
+    def _status(self):
+        return {
+            "status": self.state,
+            "indexed": self.indexed,
+            "total": self.total,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error
+        }
+
+    @property
+    def status(self):
+        """Status of the last rebuild, by whichever process ran it."""
+        if self.state_path is None or self.running:
+            return self._status()
+
+        try:
+            with open(self.state_path) as file:
+                status = json.load(file)
+
+        except (OSError, ValueError):
+            return self._status()
+
+        if status["status"] == RUNNING:
+            fd = self._open_lock()
+            if fd is not None:
+                # The process that ran it died midway.
+                os.close(fd)
+                status.update(status=FAILED, error="interrupted")
+
+        return status
@@ -0,0 +1,145 @@
+"""Conditional and compressed responses."""
+import zlib
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.responses import Response
+
+from streaming import region_response
+
+try:
+    import brotli
+
+except ImportError:
+    brotli = None
+
+# A file is never rewritten in place under the same version, so clients and
+# proxies may keep its assets for good.
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+GZIP = "gzip"
+BROTLI = "br"
+
+# Assets are compressed once and cached, so they get the best ratio.
+ASSET_LEVELS = {GZIP: 9, BROTLI: 11}
+
+
+def negotiate_encoding(accept_encoding):
+    """The preferred supported encoding `Accept-Encoding` allows, or None."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+
+            except ValueError:
+                quality = 0.0
+
+        accepted[coding.strip().lower()] = quality
+
+    best = None
+    for coding in ((BROTLI, GZIP) if brotli is not None else (GZIP,)):
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = coding, quality
+
+    return best and best[0]
+
+
+def compress(data, encoding, level=None):
+    if encoding is None:
+        return data
+
+    if level is None:
+        level = ASSET_LEVELS[encoding]
+
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=level)
+
+    # A gzip wrapper with a zero mtime, so equal input gives equal output.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def file_etag(stats, filename, encoding=None, variant=None):
+    """Strong ETag of a file's identity: its path, size and mtime, and the
+    `variant` of the asset served from it (e.g. an icon size). Each content
+    encoding is a representation of its own, with its own tag."""
+    identity = f"{filename}:{stats.st_size}:{stats.st_mtime_ns}"
+    if variant is not None:
+        identity += f":{variant}"
+
+    etag = hashlib.sha1(identity.encode()).hexdigest()[:20]
+    if encoding is not None:
+        etag += f"-{encoding}"
+
+    return f'"{etag}"'
+
+
+def etag_matches(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+
+    # Weak comparison, as If-None-Match asks for.
+    return any(tag.strip().replace("W/", "", 1) == etag
+               for tag in if_none_match.split(","))
+
+
+def not_modified_since(if_modified_since, mtime):
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+
+    except (TypeError, ValueError, IndexError):
+        return False
+
+    if since is None:
+        return False
+
+    # HTTP dates have a resolution of one second.
+    return int(mtime) <= since.timestamp()
+
+
+async def asset_response(request, extension, stats, load, media_type,
+                         compressible=False, span=None, variant=None):
+    """Respond with `await load(encoding)` unless the client's copy (of the
+    file `stats` describes) is still current. `load` is only called when the
+    asset is actually sent; for `compressible` assets it gets the negotiated
+    content encoding (or None) and returns the bytes in that encoding. With
+    a `span`, `(offset, size)` in the extension's file, the asset is
+    streamed from there instead. `variant` tells apart assets derived from
+    the file in configurable ways, like resized icons."""
+    encoding = None
+    if compressible:
+        encoding = negotiate_encoding(
+            request.headers.get("accept-encoding", ""))
+
+    headers = {
+        "ETag": file_etag(stats, extension.filename, encoding, variant),
+        "Last-Modified": formatdate(stats.st_mtime, usegmt=True),
+        "Cache-Control": CACHE_CONTROL
+    }
+    if compressible:
+        headers["Vary"] = "Accept-Encoding"
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = etag_matches(if_none_match, headers["ETag"])
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        fresh = if_modified_since is not None and \
+            not_modified_since(if_modified_since, stats.st_mtime)
+
+    if fresh:
+        return Response(status_code=304, headers=headers)
+
+    if span is not None:
+        return region_response(request, str(extension.filename), *span,
+                               headers=headers, media_type=media_type)
+
+    return Response(content=await load(encoding), media_type=media_type,
+                    headers=headers)
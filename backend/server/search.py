@@ -0,0 +1,248 @@
+"""Ranked full-text search over extension packs."""
+import re
+import math
+import heapq
+import bisect
+from collections import Counter
+
+SEPARATORS = re.compile(r"[\s\-,_]+")
+PUNCTUATION = ".:;!?()[]{}\"'`*"
+
+# Relative weight of a term occurrence in each field.
+FIELD_BOOSTS = {
+    "name": 3.0,
+    "display_name": 3.0,
+    "tags": 2.0,
+    "publisher": 1.5,
+    "description": 1.0
+}
+
+# Weight of a term that only matches an indexed token as a prefix
+# ("pyth" -> "python"), relative to an exact match.
+PREFIX_WEIGHT = 0.5
+
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    tokens = []
+    for token in SEPARATORS.split(text.casefold()):
+        token = token.strip(PUNCTUATION)
+        if token:
+            tokens.append(token)
+
+    return tokens
+
+
+def document_fields(extension):
+    return {
+        "name": extension.name,
+        "display_name": extension.display_name or "",
+        "tags": " ".join(extension.tags),
+        "publisher": extension.publisher,
+        "description": extension.description or ""
+    }
+
+
+def merge_postings(matched, within, size):
+    """`{doc_id: weighted frequency}` of the documents in any of the
+    `(postings, weight)` of `matched` (and in `within`, if given). The
+    postings are merged whole or, when `within` is small, looked up for
+    each of its documents, whichever is cheaper."""
+    merged = {}
+    if within is None or len(within) * len(matched) > size:
+        for postings, weight in matched:
+            for doc_id, frequency in postings.items():
+                merged[doc_id] = merged.get(doc_id, 0.0) + weight * frequency
+
+        if within is not None:
+            merged = {doc_id: frequency for doc_id, frequency
+                      in merged.items() if doc_id in within}
+
+        return merged
+
+    for doc_id in within:
+        frequency = 0.0
+        for postings, weight in matched:
+            frequency += weight * postings.get(doc_id, 0.0)
+
+        if frequency:
+            merged[doc_id] = frequency
+
+    return merged
+
+
+class SearchIndex:
+    """Inverted index with BM25F scoring. Each document is indexed once,
+    with term frequencies and length weighted by `FIELD_BOOSTS`."""
+
+    def __init__(self):
+        self._doc_ids = {}
+        self._docs = {}
+        self._order = {}
+        self._doc_terms = {}
+        self._lengths = {}
+        self._total_length = 0.0
+        self._next_id = 0
+
+        self._postings = {}
+        self._vocabulary = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, doc):
+        return doc in self._doc_ids
+
+    def add(self, doc, fields, order):
+        """Index `doc` (replacing any previous version of it). `order`, a
+        tuple unique to the document, breaks ties between equally scored
+        documents."""
+        self.remove(doc)
+
+        frequencies = Counter()
+        length = 0.0
+        for field, text in fields.items():
+            boost = FIELD_BOOSTS[field]
+            for token in tokenize(text):
+                frequencies[token] += boost
+                length += boost
+
+        doc_id = self._next_id
+        self._next_id += 1
+        self._doc_ids[doc] = doc_id
+        self._docs[doc_id] = doc
+        self._order[doc_id] = order
+        self._doc_terms[doc_id] = list(frequencies)
+        self._lengths[doc_id] = length
+        self._total_length += length
+
+        for token, frequency in frequencies.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._vocabulary = None
+
+            postings[doc_id] = frequency
+
+    def remove(self, doc):
+        doc_id = self._doc_ids.pop(doc, None)
+        if doc_id is None:
+            return
+
+        del self._docs[doc_id]
+        del self._order[doc_id]
+        self._total_length -= self._lengths.pop(doc_id)
+        for token in self._doc_terms.pop(doc_id):
+            postings = self._postings[token]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[token]
+                self._vocabulary = None
+
+    def postings(self, token):
+        """`{doc: frequency}` of the documents containing `token`."""
+        return {self._docs[doc_id]: frequency
+                for doc_id, frequency in self._postings.get(token, {}).items()}
+
+    @property
+    def vocabulary(self):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+
+        return self._vocabulary
+
+    def expand(self, term):
+        """Yield `(token, weight)` for every indexed token `term` matches."""
+        vocabulary = self.vocabulary
+        index = bisect.bisect_left(vocabulary, term)
+        while index < len(vocabulary) and vocabulary[index].startswith(term):
+            token = vocabulary[index]
+            yield token, 1.0 if token == term else PREFIX_WEIGHT
+            index += 1
+
+    def score(self, terms, within=None):
+        """Return `{doc_id: score}` for the documents matching every term
+        (and in `within`, a set of doc ids, if given). Each term is scored
+        as one posting merged from its expansions, prefix matches weighted
+        by `PREFIX_WEIGHT`, so short prefixes cost no more to score than a
+        word. Terms are applied smallest first, each narrowing the
+        candidates."""
+        expansions = []
+        for term in dict.fromkeys(terms):
+            matched = [(self._postings[token], weight)
+                       for token, weight in self.expand(term)]
+            if not matched:
+                return {}
+
+            expansions.append(
+                (sum(len(postings) for postings, _ in matched), matched))
+
+        count = len(self._docs)
+        merged_terms = []
+        matches = within
+        for size, matched in sorted(expansions, key=lambda item: item[0]):
+            merged = merge_postings(matched, matches, size)
+            if not merged:
+                return {}
+
+            matches = merged.keys()
+            # The expansions' document frequency, exact when no document
+            # holds two of them.
+            frequency = min(count, size)
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            merged_terms.append((idf, merged))
+
+        average_length = self._total_length / count
+        scores = {}
+        for doc_id in matches:
+            norm = K1 * (1 - B + B * self._lengths[doc_id] / average_length)
+            score = 0.0
+            for idf, merged in merged_terms:
+                frequency = merged[doc_id]
+                score += idf * frequency * (K1 + 1) / (frequency + norm)
+
+            scores[doc_id] = score
+
+        return scores
+
+    def rank(self, query, offset=0, limit=None, within=None, after=None):
+        """Return `(matches, ranked)`: every matching document, and the
+        `(key, document)` pairs of the requested page, best first. Keys are
+        `(-score,) + order`; `after` continues from the key of the last
+        document of the previous page. An empty query matches everything,
+        in tie-break order. `within` restricts the search to a set of
+        documents."""
+        if within is not None:
+            within = {self._doc_ids[doc] for doc in within
+                      if doc in self._doc_ids}
+
+        terms = tokenize(query)
+        if terms:
+            scores = self.score(terms, within)
+        else:
+            scores = dict.fromkeys(
+                self._docs if within is None else within, 0.0)
+
+        order = self._order
+        keyed = (((-score,) + order[doc_id], doc_id)
+                 for doc_id, score in scores.items())
+        if after is not None:
+            keyed = (item for item in keyed if item[0] > after)
+
+        if limit is None:
+            ranked = sorted(keyed)
+        else:
+            ranked = heapq.nsmallest(offset + limit, keyed)
+
+        docs = self._docs
+        return [docs[doc_id] for doc_id in scores], \
+            [(key, docs[doc_id]) for key, doc_id in ranked[offset:]]
+
+    def search(self, query, offset=0, limit=None, within=None):
+        """Return `(matches, page)`: every matching document and the
+        requested page of them, best first."""
+        matches, ranked = self.rank(query, offset=offset, limit=limit,
+                                    within=within)
+        return matches, [doc for _, doc in ranked]
@@ -0,0 +1,295 @@
+"""Index snapshots shared by the server processes.
+
+A snapshot holds the index records, `(filename, size, mtime, metadata)`,
+of every indexed file. The base snapshot is a single immutable file that
+is written whole and renamed into place, laid out as:
+
+    header | record offsets (uint64[count + 1]) | records | keys
+
+Records are the JSON metadata of each file; keys are one JSON list of
+`[filename, size, mtime]` in record order. Processes map the file and
+decode only the keys and the records of files that changed for them.
+
+Changes made since the base are appended to a journal next to it, one
+JSON line per change: the records of the files it (re)indexed and the
+names of the files it removed. Its first line names the base it follows.
+Once the journal outgrows the base, the next change writes a new base
+and starts a new journal.
+"""
+import os
+import json
+import mmap
+import time
+import fcntl
+import struct
+from array import array
+from logging import getLogger
+from dataclasses import asdict
+from contextlib import contextmanager
+
+from manifest import Manifest
+
+LOGGER = getLogger("app")
+
+MAGIC = b"VXS1"
+# magic, generation, count, keys offset, keys length
+HEADER = struct.Struct("<4sQIQQ")
+
+
+def record_json(record):
+    filename, size, mtime, metadata = record
+    return [filename, size, mtime, asdict(metadata)]
+
+
+def record_from_json(data):
+    filename, size, mtime, metadata = data
+    return filename, size, mtime, Manifest(**metadata)
+
+
+def write_snapshot(path, generation, records):
+    """Write `records` to `path` through a temporary file and an atomic
+    rename, so readers see either the old snapshot or the new one."""
+    keys = []
+    blobs = []
+    for filename, size, mtime, metadata in records:
+        keys.append([filename, size, mtime])
+        blobs.append(json.dumps(asdict(metadata)).encode())
+
+    offsets = array("Q")
+    position = HEADER.size + offsets.itemsize * (len(blobs) + 1)
+    for blob in blobs:
+        offsets.append(position)
+        position += len(blob)
+
+    offsets.append(position)
+    keys_data = json.dumps(keys).encode()
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(HEADER.pack(MAGIC, generation, len(blobs), position,
+                               len(keys_data)))
+        file.write(offsets.tobytes())
+        for blob in blobs:
+            file.write(blob)
+
+        file.write(keys_data)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary, path)
+
+
+def write_journal(path, base):
+    """Start an empty journal following the base snapshot `base`."""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(json.dumps({"base": base}).encode() + b"\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary, path)
+
+
+def read_generation(path):
+    """Generation of the snapshot at `path`, 0 if there is none."""
+    try:
+        with open(path, "rb") as file:
+            header = file.read(HEADER.size)
+
+    except FileNotFoundError:
+        return 0
+
+    if len(header) < HEADER.size or header[:4] != MAGIC:
+        return 0
+
+    return HEADER.unpack(header)[1]
+
+
+class Snapshot:
+    """A memory mapped snapshot file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.generation, count, keys_offset, keys_length = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not an index snapshot")
+
+        self._offsets = array("Q")
+        self._offsets.frombytes(
+            self._map[HEADER.size:
+                      HEADER.size + self._offsets.itemsize * (count + 1)])
+        self.keys = json.loads(
+            self._map[keys_offset:keys_offset + keys_length].decode())
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def metadata(self, index):
+        start, stop = self._offsets[index], self._offsets[index + 1]
+        return Manifest(**json.loads(self._map[start:stop].decode()))
+
+    def close(self):
+        self._map.close()
+
+
+class SnapshotStore:
+    """The snapshot at `path` and its journal as seen by one process:
+    publishes its index changes and applies the ones other processes
+    published."""
+
+    def __init__(self, path, poll_seconds=1.0):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.lock_path = f"{path}.lock"
+        self.poll_seconds = poll_seconds
+        # Generation of the last change this process's index matches, the
+        # base snapshot it builds on and how much of its journal is applied.
+        self.generation = 0
+        self.base = 0
+        self.offset = 0
+        self.checked = 0.0
+
+    def due(self):
+        return time.monotonic() - self.checked >= self.poll_seconds
+
+    @contextmanager
+    def locked(self):
+        """Exclusive lock for publishers, across processes."""
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+
+        finally:
+            os.close(fd)
+
+    def _open_journal(self):
+        """The open journal and the base it follows, or None."""
+        try:
+            journal = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return None
+
+        header = journal.readline()
+        if not header.endswith(b"\n"):
+            journal.close()
+            return None
+
+        return journal, json.loads(header)["base"]
+
+    def pending(self):
+        """Whether other processes published changes this process lacks."""
+        self.checked = time.monotonic()
+        opened = self._open_journal()
+        if opened is None:
+            return False
+
+        journal, base = opened
+        with journal:
+            return base != self.base or \
+                os.fstat(journal.fileno()).st_size != self.offset
+
+    def sync(self, indexer):
+        """Apply newer published changes to `indexer`: a new base snapshot,
+        then the journal entries it lacks. Returns the filenames whose
+        packages changed."""
+        self.checked = time.monotonic()
+        opened = self._open_journal()
+        if opened is None:
+            return []
+
+        changed = []
+        journal, base = opened
+        with journal:
+            if base != self.base:
+                with Snapshot(self.path) as snapshot:
+                    if snapshot.generation != base:
+                        # A new base is being written; catch up later.
+                        return []
+
+                    stamps = {}
+                    positions = {}
+                    for index, (filename, size, mtime) in \
+                            enumerate(snapshot.keys):
+                        stamps[filename] = (size, mtime)
+                        positions[filename] = index
+
+                    changed = indexer.sync_records(
+                        stamps,
+                        lambda filename: snapshot.metadata(positions[filename]))
+
+                self.base = self.generation = base
+                self.offset = journal.tell()
+
+            journal.seek(self.offset)
+            for line in journal:
+                if not line.endswith(b"\n"):
+                    # Still being appended.
+                    break
+
+                entry = json.loads(line)
+                changed.extend(indexer.apply_records(
+                    [record_from_json(record) for record in entry["indexed"]],
+                    entry["removed"]))
+                self.generation = entry["generation"]
+                self.offset += len(line)
+
+        if changed:
+            LOGGER.info(f"Index snapshot {self.generation}: "
+                        f"{len(changed)} files changed")
+        return changed
+
+    def publish(self, indexer, changed=None):
+        """Publish the index of `indexer` as the next generation: as a
+        journal entry for the `changed` files, or as a new base when
+        `changed` is None (a full index) or the journal outgrew the base.
+        Callers hold `locked()` and synced first, so no change is lost."""
+        self.generation = max(self.generation,
+                              read_generation(self.path)) + 1
+        opened = self._open_journal()
+        if opened is None:
+            compact = True
+        else:
+            journal, base = opened
+            with journal:
+                compact = changed is None or base != self.base or \
+                    os.fstat(journal.fileno()).st_size > \
+                    os.path.getsize(self.path)
+
+        if compact:
+            # The base first: readers skip a journal that does not follow
+            # the base they find.
+            write_snapshot(self.path, self.generation, indexer.records())
+            write_journal(self.journal_path, self.generation)
+            self.base = self.generation
+            self.offset = os.path.getsize(self.journal_path)
+            return
+
+        changed = set(changed)
+        indexed = [filename for filename in changed
+                   if filename in indexer.filename_to_extension_pack]
+        entry = {
+            "generation": self.generation,
+            "indexed": [record_json(record)
+                        for record in indexer.records(indexed)],
+            "removed": sorted(changed.difference(indexed))
+        }
+        line = json.dumps(entry, separators=(",", ":")).encode() + b"\n"
+        fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        self.offset += len(line)
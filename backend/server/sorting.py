@@ -0,0 +1,163 @@
+"""Sorted indexes for the `sortBy` orders of `extensionquery`."""
+import heapq
+import bisect
+
+# VS Code's SortBy values.
+RELEVANCE_SORT = 0
+LAST_UPDATED_SORT = 1
+TITLE_SORT = 2
+PUBLISHER_SORT = 3
+INSTALL_COUNT_SORT = 4
+PUBLISHED_DATE_SORT = 10
+
+SORTED_ORDERS = (LAST_UPDATED_SORT, TITLE_SORT, PUBLISHER_SORT,
+                 INSTALL_COUNT_SORT, PUBLISHED_DATE_SORT)
+
+# VS Code's SortOrder values.
+DEFAULT_ORDER = 0
+ASCENDING_ORDER = 1
+DESCENDING_ORDER = 2
+
+# Orders that read best newest / biggest first when no order is given.
+DESCENDING_BY_DEFAULT = {LAST_UPDATED_SORT, INSTALL_COUNT_SORT,
+                         PUBLISHED_DATE_SORT}
+
+NUMBER = (int, float)
+# Element types of the keys of each order, relevance keys being
+# `(-score, publisher, name)`.
+KEY_LAYOUTS = {
+    RELEVANCE_SORT: (NUMBER, str, str),
+    LAST_UPDATED_SORT: (str,) * 5,
+    TITLE_SORT: (str,) * 5,
+    PUBLISHER_SORT: (str,) * 4,
+    INSTALL_COUNT_SORT: (NUMBER,) + (str,) * 4,
+    PUBLISHED_DATE_SORT: (str,) * 5
+}
+
+
+def sort_keys(extension_pack):
+    """`{sort_by: key}` for every sorted index. Keys end with the pack's
+    identity, so they are unique and the order is total."""
+    latest = extension_pack.latest_package
+    identity = (extension_pack.publisher.casefold(),
+                extension_pack.name.casefold(),
+                extension_pack.publisher, extension_pack.name)
+    return {
+        LAST_UPDATED_SORT: (latest.modified_time,) + identity,
+        TITLE_SORT: ((latest.display_name or extension_pack.name).casefold(),)
+                    + identity,
+        PUBLISHER_SORT: identity,
+        # No install statistics are collected, every pack counts as 0.
+        INSTALL_COUNT_SORT: (0,) + identity,
+        PUBLISHED_DATE_SORT: (latest.created_time,) + identity
+    }
+
+
+def is_descending(sort_by, sort_order):
+    if sort_order == DEFAULT_ORDER:
+        return sort_by in DESCENDING_BY_DEFAULT
+
+    return sort_order == DESCENDING_ORDER
+
+
+def valid_key(key, sort_by):
+    """Whether `key`, as sent back by a client, is laid out like the keys
+    of `sort_by`, so comparing it with them cannot fail. Orders without a
+    sorted index are served by relevance."""
+    layout = KEY_LAYOUTS.get(sort_by, KEY_LAYOUTS[RELEVANCE_SORT])
+    return len(key) == len(layout) and \
+        all(isinstance(value, kind) for value, kind in zip(key, layout))
+
+
+class SortedIndex:
+    """Items kept in key order with bisect, so a page of the whole set is a
+    slice and a page of a subset is a short walk or a small heap."""
+
+    def __init__(self):
+        self._keys = []
+        self._items = []
+        self._key_of = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item, key):
+        """Insert `item`, or move it if its key changed."""
+        if self._key_of.get(item) == key:
+            return
+
+        self.remove(item)
+        index = bisect.bisect_left(self._keys, key)
+        self._keys.insert(index, key)
+        self._items.insert(index, item)
+        self._key_of[item] = key
+
+    def remove(self, item):
+        key = self._key_of.pop(item, None)
+        if key is None:
+            return
+
+        index = bisect.bisect_left(self._keys, key)
+        del self._keys[index]
+        del self._items[index]
+
+    def key_of(self, item):
+        return self._key_of[item]
+
+    def page(self, offset, limit, descending=False, within=None, after=None):
+        """Items `offset` to `offset + limit` in order, optionally only
+        counting the items in the set `within`. `after` continues from the
+        key of the last item of the previous page."""
+        if limit is None:
+            limit = len(self._items)
+
+        # Bounds of the part of the order that is left to page through.
+        start, stop = 0, len(self._items)
+        if after is not None:
+            if descending:
+                stop = bisect.bisect_left(self._keys, after)
+            else:
+                start = bisect.bisect_right(self._keys, after)
+
+        if within is None:
+            if descending:
+                stop -= offset
+                return self._items[max(stop - limit, start):
+                                   max(stop, start)][::-1]
+
+            return self._items[start + offset:start + offset + limit]
+
+        if len(within) * 4 < len(self._items):
+            # Small subset: pick the page with a heap over its own keys.
+            select = heapq.nlargest if descending else heapq.nsmallest
+            candidates = (item for item in within if item in self._key_of)
+            if after is not None:
+                candidates = (item for item in candidates
+                              if (self._key_of[item] < after if descending
+                                  else self._key_of[item] > after))
+
+            return select(offset + limit, candidates,
+                          key=self._key_of.__getitem__)[offset:]
+
+        # Large subset: walk the presorted order, skipping non members.
+        page = []
+        skipped = 0
+        if descending:
+            order = (self._items[index]
+                     for index in range(stop - 1, start - 1, -1))
+        else:
+            order = (self._items[index] for index in range(start, stop))
+
+        for item in order:
+            if item not in within:
+                continue
+
+            if skipped < offset:
+                skipped += 1
+                continue
+
+            page.append(item)
+            if len(page) == limit:
+                break
+
+        return page
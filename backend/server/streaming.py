@@ -0,0 +1,148 @@
+"""Streaming of file regions (whole packages or stored zip members) with
+HTTP Range support."""
+import os
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 256 * 1024))
+
+# ASGI extension for servers that can sendfile() a file themselves.
+ZERO_COPY_SEND = "http.response.zerocopysend"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """`(start, stop)` of a single `bytes=` range within `size` bytes, or
+    None when the header is to be ignored (malformed or multiple ranges)."""
+    units, _, ranges = header.partition("=")
+    if units.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+
+            return max(size - length, 0), size
+
+        start = int(first)
+        stop = int(last) + 1 if last else size
+
+    except ValueError:
+        return None
+
+    if start >= size or stop <= start:
+        raise RangeNotSatisfiable(header)
+
+    return start, min(stop, size)
+
+
+def if_range_matches(if_range, headers):
+    """Whether the representation `If-Range` names is the current one. An
+    entity tag must match strongly, a date exactly."""
+    if_range = if_range.strip()
+    if if_range.startswith("W/"):
+        return False
+
+    if if_range.startswith('"'):
+        return if_range == headers.get("ETag")
+
+    return if_range == headers.get("Last-Modified")
+
+
+class FileRegionResponse(Response):
+    """Sends `size` bytes of `path` from `offset`, in `CHUNK_SIZE` reads
+    done off the event loop, or with a single zero-copy send where the
+    server supports it. Memory use does not depend on the region size."""
+
+    def __init__(self, path, offset, size, status_code=200, headers=None,
+                 media_type=None, method=None):
+        self.path = path
+        self.offset = offset
+        self.size = size
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.send_header_only = method is not None and \
+            method.upper() == "HEAD"
+        self.init_headers(headers)
+        self.headers["content-length"] = str(size)
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers
+        })
+        if self.send_header_only or self.size == 0:
+            await send({"type": "http.response.body"})
+            return
+
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            if ZERO_COPY_SEND in scope.get("extensions", {}):
+                with os.fdopen(fd, "rb", closefd=False) as file:
+                    await send({
+                        "type": ZERO_COPY_SEND,
+                        "file": file,
+                        "offset": self.offset,
+                        "count": self.size
+                    })
+
+                return
+
+            position = self.offset
+            end = self.offset + self.size
+            while position < end:
+                chunk = await run_in_threadpool(
+                    os.pread, fd, min(CHUNK_SIZE, end - position), position)
+                if not chunk:
+                    raise RuntimeError(f"{self.path} was truncated while "
+                                       f"being sent")
+
+                position += len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": position < end
+                })
+
+        finally:
+            os.close(fd)
+
+
+def region_response(request, path, offset, size, headers, media_type):
+    """Respond with the region, or the part of it `Range` asks for (unless
+    `If-Range` names an older representation)."""
+    headers = dict(headers, **{"Accept-Ranges": "bytes"})
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header is None or \
+            (if_range is not None and not if_range_matches(if_range, headers)):
+        return FileRegionResponse(path, offset, size, headers=headers,
+                                  media_type=media_type,
+                                  method=request.method)
+
+    try:
+        requested = parse_range(range_header, size)
+
+    except RangeNotSatisfiable:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if requested is None:
+        return FileRegionResponse(path, offset, size, headers=headers,
+                                  media_type=media_type,
+                                  method=request.method)
+
+    start, stop = requested
+    headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+    return FileRegionResponse(path, offset + start, stop - start,
+                              status_code=206, headers=headers,
+                              media_type=media_type, method=request.method)
@@ -14,6 +14,7 @@ class MockedExtension:
         "Microsoft.VisualStudio.Services.Branding.Color": "#1e415e"
     }
     tags = ["mocked", "extension"]
+    categories = ["Other"]
     license = "MIT"
     manifest = "{}"
     details = "This is a mocked extension details"
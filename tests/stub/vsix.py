@@ -0,0 +1,52 @@
+from zipfile import ZipFile, ZIP_DEFLATED
+
+MANIFEST_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<PackageManifest Version="2.0.0" xmlns="http://schemas.microsoft.com/developer/vsx-schema/2011" xmlns:d="http://schemas.microsoft.com/developer/vsx-schema-design/2011">
+  <Metadata>
+    <Identity Language="en-US" Id="{name}" Version="{version}" Publisher="{publisher}" />
+    <DisplayName>{display_name}</DisplayName>
+    <Description xml:space="preserve">{description}</Description>
+    <Tags>{tags}</Tags>
+    <Categories>{categories}</Categories>
+    <GalleryFlags>Public</GalleryFlags>
+    <Properties>
+      <Property Id="Microsoft.VisualStudio.Code.Engine" Value="^1.36.0" />
+      <Property Id="Microsoft.VisualStudio.Services.Branding.Color" Value="#1e415e" />
+    </Properties>
+    <License>extension/LICENSE.txt</License>
+    <Icon>extension/icon.png</Icon>
+  </Metadata>
+  <Installation>
+    <InstallationTarget Id="Microsoft.VisualStudio.Code"/>
+  </Installation>
+  <Dependencies/>
+  <Assets>
+    <Asset Type="Microsoft.VisualStudio.Code.Manifest" Path="extension/package.json" Addressable="true" />
+    <Asset Type="Microsoft.VisualStudio.Services.Content.Details" Path="extension/README.md" Addressable="true" />
+    <Asset Type="Microsoft.VisualStudio.Services.Content.License" Path="extension/LICENSE.txt" Addressable="true" />
+    <Asset Type="Microsoft.VisualStudio.Services.Icons.Default" Path="extension/icon.png" Addressable="true" />
+  </Assets>
+</PackageManifest>
+"""
+
+
+def build_vsix(path, publisher="mocker", name="mocked_extension",
+               version="0.1.0", display_name="Mocked Extension",
+               description="This is a mocked extension description",
+               tags="mocked,extension", categories="Other",
+               readme=b"# Mocked extension", icon=b"\x89PNG\r\n\x1a\nicon",
+               compression=ZIP_DEFLATED):
+    manifest = MANIFEST_TEMPLATE.format(
+        publisher=publisher, name=name, version=version,
+        display_name=display_name, description=description,
+        tags=tags, categories=categories)
+
+    with ZipFile(str(path), "w", compression=compression) as zip_file:
+        zip_file.writestr("extension.vsixmanifest", manifest)
+        zip_file.writestr("extension/package.json",
+                          f'{{"name": "{name}", "version": "{version}"}}')
+        zip_file.writestr("extension/README.md", readme)
+        zip_file.writestr("extension/LICENSE.txt", "MIT")
+        zip_file.writestr("extension/icon.png", icon)
+
+    return str(path)
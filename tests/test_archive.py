@@ -0,0 +1,74 @@
+import os
+from zipfile import ZipFile, ZIP_STORED
+
+import pytest
+
+from backend.server.archive import ArchivePool
+from stub.vsix import build_vsix
+
+
+@pytest.mark.parametrize("compression", [None, ZIP_STORED])
+def test_read_matches_zipfile(tmp_path, compression):
+    kwargs = {"compression": compression} if compression is not None else {}
+    filename = build_vsix(tmp_path / "ext.vsix", readme=b"# readme" * 1000,
+                          **kwargs)
+    pool = ArchivePool(max_open=4)
+
+    with ZipFile(filename) as zip_file:
+        for name in zip_file.namelist():
+            assert pool.read(filename, name) == zip_file.read(name)
+
+
+def test_stored_span(tmp_path):
+    readme = b"# readme" * 1000
+    stored = build_vsix(tmp_path / "stored.vsix", readme=readme,
+                        compression=ZIP_STORED)
+    deflated = build_vsix(tmp_path / "deflated.vsix", readme=readme)
+    pool = ArchivePool(max_open=4)
+
+    offset, size = pool.stored_span(stored, "extension/README.md")
+    with open(stored, "rb") as package:
+        package.seek(offset)
+        assert package.read(size) == readme
+
+    assert pool.stored_span(deflated, "extension/README.md") is None
+
+
+def test_missing_member(tmp_path):
+    filename = build_vsix(tmp_path / "ext.vsix")
+    pool = ArchivePool(max_open=4)
+
+    with pytest.raises(KeyError):
+        pool.read(filename, "extension/missing.md")
+
+
+def test_idle_archives_are_closed(tmp_path):
+    filenames = [build_vsix(tmp_path / f"ext{i}.vsix") for i in range(5)]
+    pool = ArchivePool(max_open=2)
+
+    with pool.acquire(filenames[0]) as busy:
+        for filename in filenames[1:]:
+            pool.read(filename, "extension/README.md")
+
+        assert len(pool) == 2
+        assert busy.read("extension/README.md") == b"# Mocked extension"
+
+    pool.discard(filenames[0])
+    assert len(pool) == 1
+
+
+def test_discard_while_in_use(tmp_path):
+    filename = build_vsix(tmp_path / "ext.vsix", readme=b"old")
+    pool = ArchivePool(max_open=4)
+
+    with pool.acquire(filename) as stale:
+        build_vsix(tmp_path / "replaced.vsix", readme=b"new")
+        os.replace(str(tmp_path / "replaced.vsix"), filename)
+        pool.discard(filename)
+
+        assert len(pool) == 0
+        assert pool.read(filename, "extension/README.md") == b"new"
+        assert stale.read("extension/README.md") == b"old"
+
+    with pytest.raises(OSError):
+        os.fstat(stale.fd)
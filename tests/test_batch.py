@@ -0,0 +1,82 @@
+import requests
+
+from backend.listener.batch import Batch
+
+URL = "http://server/index_batch"
+
+
+class Session:
+    """Answers posts with the next of `responses`: a status code, or an
+    exception to raise."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.posted = []
+
+    def post(self, url, json):
+        self.posted.append(json["updates"])
+        answer = self.responses.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+
+        response = requests.Response()
+        response.status_code = answer
+        response.url = url
+        return response
+
+
+def test_debounce():
+    batch = Batch(debounce=1, max_delay=10)
+    assert not batch.due(0)
+
+    batch.add("/exts", "a.vsix", ["IN_CLOSE_WRITE"], now=0)
+    assert not batch.due(0.5)
+    assert batch.due(1)
+
+    # Steady events hold the batch back until the maximum delay.
+    for now in range(1, 10):
+        batch.add("/exts", f"{now}.vsix", ["IN_CLOSE_WRITE"], now=now - 0.5)
+        assert not batch.due(now)
+
+    assert batch.due(10)
+
+
+def test_last_event_of_a_file_wins():
+    batch = Batch(debounce=1, max_delay=10)
+    batch.add("/exts", "a.vsix", ["IN_CLOSE_WRITE"], now=0)
+    batch.add("/exts", "b.vsix", ["IN_CLOSE_WRITE"], now=0)
+    batch.add("/exts", "a.vsix", ["IN_DELETE"], now=0)
+
+    session = Session(200)
+    assert batch.send(session, URL, now=1)
+    assert session.posted == [[
+        {"path": "/exts", "filename": "b.vsix", "type_names": ["IN_CLOSE_WRITE"]},
+        {"path": "/exts", "filename": "a.vsix", "type_names": ["IN_DELETE"]}
+    ]]
+    assert len(batch) == 0
+    assert not batch.due(5)
+
+
+def test_failed_sends_are_retried():
+    batch = Batch(debounce=1, max_delay=10)
+    batch.add("/exts", "a.vsix", ["IN_CLOSE_WRITE"], now=0)
+    session = Session(requests.ConnectionError("refused"), 503, 200)
+
+    assert not batch.send(session, URL, now=1)
+    assert not batch.due(1.5)
+    assert batch.due(2)
+    assert not batch.send(session, URL, now=2)
+
+    batch.add("/exts", "b.vsix", ["IN_CLOSE_WRITE"], now=2.5)
+    assert batch.send(session, URL, now=3.5)
+    assert [len(updates) for updates in session.posted] == [1, 1, 2]
+    assert len(batch) == 0
+
+
+def test_rejected_batches_are_dropped():
+    batch = Batch(debounce=1, max_delay=10)
+    batch.add("/exts", "a.vsix", ["IN_CLOSE_WRITE"], now=0)
+
+    assert batch.send(Session(422), URL, now=1)
+    assert len(batch) == 0
+    assert not batch.due(100)
@@ -0,0 +1,50 @@
+from backend.server.cache import LRUCache
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.lookup("a") == b"1234"
+
+    cache.put("c", b"1234")
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.size == 8
+    assert cache.stats["evictions"] == 1
+
+
+def test_get_loads_once():
+    cache = LRUCache(max_bytes=10)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return b"value"
+
+    assert cache.get("key", loader) == b"value"
+    assert cache.get("key", loader) == b"value"
+    assert len(calls) == 1
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+
+def test_oversized_values_are_not_cached():
+    cache = LRUCache(max_bytes=4)
+    cache.put("key", b"too large")
+
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+def test_discard():
+    cache = LRUCache(max_bytes=100)
+    cache.put(("one.vsix", "icon"), b"1")
+    cache.put(("one.vsix", "details"), b"2")
+    cache.put(("two.vsix", "icon"), b"3")
+
+    cache.discard(lambda key: key[0] == "one.vsix")
+
+    assert len(cache) == 1
+    assert cache.size == 1
@@ -0,0 +1,39 @@
+import random
+
+from backend.server.indexer import Indexer
+from backend.server.consistency import check_index, compare, rebuild
+from stub.vsix import build_vsix
+
+
+def test_incremental_changes_match_a_rebuild(tmp_path):
+    rng = random.Random(2)
+    indexer = Indexer(str(tmp_path))
+    files = [str(tmp_path / f"{index}.vsix") for index in range(8)]
+    for _ in range(40):
+        filename = rng.choice(files)
+        if rng.random() < 0.3:
+            indexer.apply_batch(removed=[filename])
+        else:
+            build_vsix(filename, name=f"package{rng.randint(1, 3)}",
+                       version=f"0.{rng.randint(1, 3)}.0",
+                       display_name=rng.choice(["Python Linter", "Pylint"]),
+                       tags=rng.choice(["lint,python", "format", "pytest"]))
+            indexer.apply_batch(indexed=[filename])
+
+        assert check_index(indexer) == []
+
+
+def test_compare_reports_differences(tmp_path):
+    one = build_vsix(tmp_path / "one.vsix", name="package1")
+    indexer = Indexer(str(tmp_path))
+    indexer.apply_batch(indexed=[one])
+    fresh = rebuild(indexer)
+
+    extension_pack = indexer.extensions["mocker"]["package1"]
+    indexer.trie.add(extension_pack, "stale")
+    differences = compare(indexer, fresh)
+
+    assert differences == [
+        "trie references ('mocker', 'package1'): 9, rebuilt 8",
+        "trie leaves 'stale': [('mocker', 'package1')], rebuilt None"
+    ]
@@ -0,0 +1,46 @@
+import pickle
+
+from backend.server.extension import Extension, DETAILS, read_metadata
+from backend.server.manifest import Manifest
+from stub.vsix import build_vsix
+
+
+def test_manifest_fields(tmp_path):
+    ext = Extension(build_vsix(tmp_path / "ext.vsix", publisher="elran",
+                               name="package1", version="1.2.3",
+                               tags="lint,python",
+                               categories="Linters,Other"))
+
+    assert ext.publisher == "elran"
+    assert ext.name == "package1"
+    assert ext.version == "1.2.3"
+    assert ext.display_name == "Mocked Extension"
+    assert ext.description == "This is a mocked extension description"
+    assert ext.tags == ["lint", "python"]
+    assert ext.categories == ["Linters", "Other"]
+    assert ext.icon_path == "extension/icon.png"
+    assert ext.properties["Microsoft.VisualStudio.Code.Engine"] == "^1.36.0"
+    assert ext.assets[DETAILS] == "extension/README.md"
+
+
+def test_manifest_without_optional_elements():
+    manifest = Manifest.parse(
+        b'<PackageManifest><Metadata>'
+        b'<Identity Id="package1" Version="1.0.0" Publisher="elran"/>'
+        b'<Tags/></Metadata></PackageManifest>')
+
+    assert manifest.name == "package1"
+    assert manifest.tags == []
+    assert manifest.categories == []
+    assert manifest.icon_path is None
+    assert manifest.properties == {}
+    assert manifest.assets == {}
+
+
+def test_read_metadata_is_picklable(tmp_path):
+    filename = build_vsix(tmp_path / "ext.vsix")
+
+    _, metadata, error = pickle.loads(pickle.dumps(read_metadata(filename)))
+
+    assert error is None
+    assert metadata == Extension(filename).metadata
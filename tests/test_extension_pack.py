@@ -0,0 +1,82 @@
+import json
+
+from backend.server.extension import Extension, INCLUDE_VERSIONS, \
+    INCLUDE_FILES, INCLUDE_STATISTICS, INCLUDE_LATEST_VERSION_ONLY
+from backend.server.extension_pack import ExtensionPack
+from stub.vsix import build_vsix
+
+
+def test_query_json_is_rebuilt_on_change(tmp_path):
+    pack = ExtensionPack(publisher="mocker", name="mocked_extension")
+    pack.add_package(Extension(build_vsix(tmp_path / "one.vsix",
+                                          version="0.1.0")))
+
+    first = pack.query_json
+    assert pack.query_json is first
+    assert json.loads(first)["versions"][0]["version"] == "0.1.0"
+
+    newer = Extension(build_vsix(tmp_path / "two.vsix", version="0.2.0"))
+    pack.add_package(newer)
+    assert [version["version"] for version in
+            json.loads(pack.query_json)["versions"]] == ["0.2.0", "0.1.0"]
+
+    pack.remove_package(newer)
+    assert json.loads(pack.query_json) == json.loads(first)
+
+
+def test_versions_stay_sorted(tmp_path):
+    pack = ExtensionPack(publisher="mocker", name="mocked_extension")
+    packages = {}
+    for version in ["1.10.0", "1.2.0", "1.9.1-beta", "0.1.0", "1.9.1"]:
+        packages[version] = Extension(build_vsix(tmp_path / f"{version}.vsix",
+                                                 version=version))
+        pack.add_package(packages[version])
+
+    assert pack.latest_package is packages["1.10.0"]
+    assert [package.version for package in pack.sorted_packages] == \
+        ["1.10.0", "1.9.1-beta", "1.9.1", "1.2.0", "0.1.0"]
+
+    pack.remove_package(packages["1.10.0"])
+    pack.remove_package(packages["1.9.1"])
+
+    assert pack.latest_package is packages["1.9.1-beta"]
+    assert [package.version for package in pack.sorted_packages] == \
+        ["1.9.1-beta", "1.2.0", "0.1.0"]
+
+
+def test_remove_versions_with_equal_keys(tmp_path):
+    pack = ExtensionPack(publisher="mocker", name="mocked_extension")
+    packages = [Extension(build_vsix(tmp_path / f"{version}.vsix",
+                                     version=version))
+                for version in ["1.0", "1.00", "0.1.0"]]
+    for package in packages:
+        pack.add_package(package)
+
+    pack.remove_package(packages[1])
+    assert [package.version for package in pack.sorted_packages] == \
+        ["1.0", "0.1.0"]
+    pack.remove_package(packages[0])
+    pack.remove_package(packages[2])
+    assert len(pack) == 0
+
+
+def test_query_fragment_honors_flags(tmp_path):
+    pack = ExtensionPack(publisher="mocker", name="mocked_extension")
+    for version in ["0.1.0", "0.2.0"]:
+        pack.add_package(Extension(build_vsix(tmp_path / f"{version}.vsix",
+                                              version=version)))
+
+    latest_only = json.loads(pack.query_fragment(INCLUDE_LATEST_VERSION_ONLY))
+    assert [version["version"] for version in latest_only["versions"]] == \
+        ["0.2.0"]
+    assert "files" not in latest_only["versions"][0]
+    assert "statistics" not in latest_only
+
+    assert "versions" not in json.loads(pack.query_fragment(INCLUDE_FILES))
+
+    full = json.loads(pack.query_fragment(
+        INCLUDE_VERSIONS | INCLUDE_FILES | INCLUDE_STATISTICS))
+    assert len(full["versions"]) == 2
+    assert len(full["versions"][0]["files"]) == 7
+    assert "statistics" in full
+    assert "properties" not in full["versions"][0]
@@ -0,0 +1,49 @@
+from backend.server.filestore import FileStore
+
+
+class Extension:
+    def __init__(self, path):
+        self.filename = path
+        self.stats = path.stat()
+
+
+def test_file_store(tmp_path):
+    path = tmp_path / "package.vsix"
+    path.write_bytes(b"data")
+    produced = []
+
+    def produce():
+        produced.append(1)
+        return b"derived"
+
+    store = FileStore(str(tmp_path / "store"))
+    assert store.get(Extension(path), "details.gzip", produce) == b"derived"
+    assert FileStore(str(tmp_path / "store")).get(
+        Extension(path), "details.gzip", produce) == b"derived"
+    assert len(produced) == 1
+
+    # A rewritten file is another identity.
+    path.write_bytes(b"other data")
+    store.get(Extension(path), "details.gzip", produce)
+    assert len(produced) == 2
+
+    assert FileStore().get(Extension(path), "details.gzip", produce) == \
+        b"derived"
+    assert len(produced) == 3
+
+
+def test_prune(tmp_path):
+    kept = tmp_path / "kept.vsix"
+    kept.write_bytes(b"data")
+    dropped = tmp_path / "dropped.vsix"
+    dropped.write_bytes(b"data")
+    store = FileStore(str(tmp_path / "store"))
+    for path in (kept, dropped):
+        store.get(Extension(path), "64", lambda: b"icon")
+        store.get(Extension(path), "256", lambda: b"icon")
+
+    assert store.prune([Extension(kept)]) == 2
+    assert sorted(path.name for path in (tmp_path / "store").iterdir()) == \
+        sorted([FileStore.digest(Extension(kept)) + "-64",
+                FileStore.digest(Extension(kept)) + "-256"])
+    assert FileStore().prune([]) == 0
@@ -0,0 +1,52 @@
+import io
+
+import pytest
+
+from backend.server import icons
+from backend.server.icons import IconCache, thumbnail
+
+
+def png(size):
+    Image = pytest.importorskip("PIL.Image")
+    output = io.BytesIO()
+    Image.new("RGBA", (size, size), (30, 65, 94, 255)).save(output, "PNG")
+    return output.getvalue()
+
+
+def test_thumbnail():
+    Image = pytest.importorskip("PIL.Image")
+    small = thumbnail(png(512), 64)
+    assert Image.open(io.BytesIO(small)).size == (64, 64)
+    assert Image.open(io.BytesIO(small)).format == "PNG"
+
+    original = png(32)
+    assert thumbnail(original, 64) is original
+    assert thumbnail(b"<svg/>", 64) == b"<svg/>"
+
+
+def test_thumbnail_without_pillow(monkeypatch):
+    monkeypatch.setattr(icons, "Image", None)
+    assert thumbnail(b"icon", 64) == b"icon"
+
+
+def test_icon_cache(tmp_path):
+    data = png(512)
+    path = tmp_path / "package.vsix"
+    path.write_bytes(b"data")
+    reads = []
+
+    class Extension:
+        filename = path
+        stats = path.stat()
+
+        @property
+        def icon(self):
+            reads.append(1)
+            return data
+
+    cache = IconCache(str(tmp_path / "icons"))
+    small = cache.get(Extension(), 64)
+    assert len(small) < len(data)
+    assert IconCache(str(tmp_path / "icons")).get(Extension(), 64) == small
+    assert len(reads) == 1
+    assert len(list((tmp_path / "icons").iterdir())) == 1
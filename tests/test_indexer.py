@@ -1,7 +1,13 @@
+import os
+from types import SimpleNamespace
+
 import pytest
 
-from backend.server.indexer import Indexer
+from backend.server.controller import match_criteria
+from backend.server.indexer import Indexer, TAG_FILTER_TYPE, \
+    CATEGORY_FILTER_TYPE, EXTENSION_ID_FILTER_TYPE, EXTENSION_NAME_FILTER_TYPE
 from stub.extension import MockedExtension
+from stub.vsix import build_vsix
 
 
 @pytest.fixture
@@ -60,6 +66,52 @@ def test_same_package_2_versions(indexer):
     assert len(extension_pack.packages) == 2
 
 
+def test_removing_a_version_drops_only_its_words(indexer):
+    ext1 = MockedExtension()
+    ext1.filename = "one_file.vsix"
+    ext1.version = "0.2.0"
+    ext1.tags = ["linter"]
+    ext2 = MockedExtension()
+    ext2.filename = "other_file.vsix"
+    ext2.version = "3.1.0"
+    ext2.tags = ["formatter"]
+
+    indexer.index_package(ext1)
+    indexer.index_package(ext2)
+    extension_pack = list(indexer.extension_packs)[0]
+    assert indexer.search("linter") == {extension_pack}
+    assert extension_pack.indexed_by["mocked"] == 2
+
+    indexer.remove_package(ext1)
+    assert indexer.search("linter") == set()
+    assert indexer.search("formatter") == {extension_pack}
+    assert "linter" not in extension_pack.indexed_by
+    assert extension_pack.indexed_by["mocked"] == 1
+
+    indexer.remove_package(ext2)
+    assert indexer.search("mocked") == set()
+    assert len(indexer.trie) == 0
+    assert indexer.package_words == {}
+
+
+def test_same_version_in_another_file_replaces_it(indexer):
+    ext1 = MockedExtension()
+    ext1.filename = "one_file.vsix"
+    ext1.tags = ["linter"]
+    ext2 = MockedExtension()
+    ext2.filename = "other_file.vsix"
+    ext2.tags = ["formatter"]
+
+    indexer.index_package(ext1)
+    indexer.index_package(ext2)
+
+    assert indexer.get_package("one_file.vsix") is None
+    assert indexer.search("linter") == set()
+    indexer.remove_package(ext2)
+    assert indexer.extension_packs == set()
+    assert len(indexer.trie) == 0
+
+
 def test_same_publisher_2_packages(indexer):
     ext1 = MockedExtension()
     ext1.filename = "one_file.vsix"
@@ -109,3 +161,268 @@ def test_different_publishers(indexer):
     assert len(indexer.extension_packs) == 2
     assert len(indexer.extensions["elran"]) == 1
     assert len(indexer.extensions["david"]) == 1
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_index_packages(tmp_path, workers):
+    build_vsix(tmp_path / "one.vsix", name="package1", version="0.1.0")
+    build_vsix(tmp_path / "two.vsix", name="package1", version="0.2.0")
+    build_vsix(tmp_path / "three.vsix", name="package2")
+
+    indexer = Indexer(str(tmp_path), workers=workers)
+    indexer.index_packages()
+
+    assert len(indexer.extension_packs) == 2
+    extension_pack = indexer.extensions["mocker"]["package1"]
+    assert extension_pack.latest_package.version == "0.2.0"
+    assert indexer.search("package") == indexer.extension_packs
+
+
+def test_index_packages_reports_failures(tmp_path, caplog):
+    build_vsix(tmp_path / "good.vsix")
+    (tmp_path / "broken.vsix").write_bytes(b"not a zip")
+
+    indexer = Indexer(str(tmp_path), workers=2)
+    indexer.index_packages()
+
+    assert len(indexer.extension_packs) == 1
+    assert f"Failed to index {tmp_path / 'broken.vsix'}" in caplog.text
+
+
+def test_apply_batch(tmp_path):
+    one = build_vsix(tmp_path / "one.vsix", name="package1", version="0.1.0")
+    two = build_vsix(tmp_path / "two.vsix", name="package1", version="0.2.0")
+    three = build_vsix(tmp_path / "three.vsix", name="package2")
+
+    indexer = Indexer(str(tmp_path))
+    indexer.apply_batch(indexed=[one, two, three])
+    extension_pack = indexer.extensions["mocker"]["package1"]
+    assert len(indexer.extension_packs) == 2
+    assert extension_pack.latest_package.version == "0.2.0"
+
+    # Rewritten in place with another version, and removed.
+    build_vsix(tmp_path / "one.vsix", name="package1", version="0.3.0")
+    indexer.apply_batch(indexed=[tmp_path / "one.vsix"], removed=[three])
+    assert [package.version for package in extension_pack.sorted_packages] \
+        == ["0.3.0", "0.2.0"]
+    assert indexer.get_package(one).version == "0.3.0"
+    assert indexer.get_package(three) is None
+    assert len(indexer.extension_packs) == 1
+    assert indexer.search("package2") == set()
+
+
+def test_index_packages_uses_metadata_cache(tmp_path):
+    exts = tmp_path / "exts"
+    exts.mkdir()
+    build_vsix(exts / "one.vsix", name="package1")
+    build_vsix(exts / "two.vsix", name="package2")
+    cache_path = str(tmp_path / "cache.sqlite")
+
+    Indexer(str(exts), cache_path=cache_path).index_packages()
+
+    build_vsix(exts / "two.vsix", name="package2", version="0.2.0")
+    os.utime(exts / "two.vsix", ns=(0, 10 ** 9))
+    indexer = Indexer(str(exts), cache_path=cache_path)
+    parsed = []
+    original_read_packages = indexer.read_packages
+
+    def read_packages(filenames):
+        parsed.extend(filenames)
+        return original_read_packages(filenames)
+
+    indexer.read_packages = read_packages
+    indexer.index_packages()
+
+    assert parsed == [str(exts / "two.vsix")]
+    assert len(indexer.extension_packs) == 2
+    assert indexer.extensions["mocker"]["package2"].latest_package.version \
+        == "0.2.0"
+
+
+def test_search_multiple_terms_case_insensitive(indexer):
+    ext1 = MockedExtension()
+    ext1.filename = "one_file.vsix"
+    ext1.name = "pylint"
+    ext1.description = "Python linting support"
+    ext2 = MockedExtension()
+    ext2.filename = "other_file.vsix"
+    ext2.name = "black"
+    ext2.description = "Python code formatter"
+
+    indexer.index_package(ext1)
+    indexer.index_package(ext2)
+    pylint = indexer.extensions[ext1.publisher]["pylint"]
+
+    assert indexer.search("python lint") == {pylint}
+    assert indexer.search("PYTHON Lint") == {pylint}
+    assert indexer.search("python") == indexer.extension_packs
+    assert indexer.search("python missing") == set()
+
+
+def criterion(filter_type, value):
+    return SimpleNamespace(filterType=filter_type, value=value)
+
+
+def test_criteria_indexes(indexer):
+    ext1 = MockedExtension()
+    ext1.filename = "one_file.vsix"
+    ext1.name = "package1"
+    ext1.categories = ["Linters"]
+    ext1.tags = ["python"]
+    ext2 = MockedExtension()
+    ext2.filename = "other_file.vsix"
+    ext2.name = "package2"
+    ext2.categories = ["Linters", "Themes"]
+
+    indexer.index_package(ext1)
+    indexer.index_package(ext2)
+    package1 = indexer.extensions[ext1.publisher]["package1"]
+    package2 = indexer.extensions[ext2.publisher]["package2"]
+
+    assert indexer.lookup(EXTENSION_NAME_FILTER_TYPE, "Mocker.Package1") \
+        == {package1}
+    assert indexer.lookup(EXTENSION_ID_FILTER_TYPE, package2.extension_id) \
+        == {package2}
+    assert indexer.lookup(CATEGORY_FILTER_TYPE, "linters") == \
+        {package1, package2}
+    assert indexer.lookup(TAG_FILTER_TYPE, "python") == {package1}
+
+    assert match_criteria(indexer, [
+        criterion(EXTENSION_NAME_FILTER_TYPE, "mocker.package1"),
+        criterion(EXTENSION_NAME_FILTER_TYPE, "mocker.package2"),
+        criterion(EXTENSION_NAME_FILTER_TYPE, "mocker.missing")
+    ]) == {package1, package2}
+    assert match_criteria(indexer, [
+        criterion(CATEGORY_FILTER_TYPE, "Linters"),
+        criterion(TAG_FILTER_TYPE, "python")
+    ]) == {package1}
+    assert match_criteria(indexer, [
+        criterion(EXTENSION_ID_FILTER_TYPE, package1.extension_id),
+        criterion(EXTENSION_NAME_FILTER_TYPE, "mocker.package2"),
+        criterion(CATEGORY_FILTER_TYPE, "Linters")
+    ]) == {package1, package2}
+    assert match_criteria(indexer, [criterion(10, "python")]) is None
+
+
+def test_criteria_follow_latest_version(indexer):
+    ext1 = MockedExtension()
+    ext1.filename = "one_file.vsix"
+    ext1.version = "0.1.0"
+    ext1.categories = ["Linters"]
+    ext2 = MockedExtension()
+    ext2.filename = "other_file.vsix"
+    ext2.version = "0.2.0"
+    ext2.categories = ["Themes"]
+
+    indexer.index_package(ext1)
+    indexer.index_package(ext2)
+
+    assert indexer.lookup(CATEGORY_FILTER_TYPE, "Linters") == set()
+    assert len(indexer.lookup(CATEGORY_FILTER_TYPE, "Themes")) == 1
+
+    indexer.remove_package(ext2)
+    assert len(indexer.lookup(CATEGORY_FILTER_TYPE, "Linters")) == 1
+    assert indexer.lookup(CATEGORY_FILTER_TYPE, "Themes") == set()
+
+
+def test_category_counts(indexer):
+    for name, categories in [("package1", ["Linters"]),
+                             ("package2", ["Linters", "Themes", "Linters"]),
+                             ("package3", ["Snippets"])]:
+        ext = MockedExtension()
+        ext.filename = f"{name}.vsix"
+        ext.name = name
+        ext.categories = categories
+        indexer.index_package(ext)
+
+    def counts(packs):
+        return {category["name"]: category["count"]
+                for category in indexer.category_counts(packs)}
+
+    assert counts(indexer.extension_packs) == \
+        {"Linters": 2, "Themes": 1, "Snippets": 1}
+    assert counts(indexer.search("package2")) == {"Linters": 1, "Themes": 1}
+
+    indexer.remove_package(indexer.extensions["mocker"]["package3"]
+                           .sorted_packages[0])
+    assert counts(indexer.extension_packs) == {"Linters": 2, "Themes": 1}
+
+
+def test_query_sorted(indexer):
+    for name, display_name, modified_time in [
+            ("package1", "Bravo", "2019-01-02T00:00:00.000Z"),
+            ("package2", "Alpha", "2019-01-03T00:00:00.000Z"),
+            ("package3", "Charlie", "2019-01-01T00:00:00.000Z")]:
+        ext = MockedExtension()
+        ext.filename = f"{name}.vsix"
+        ext.name = name
+        ext.display_name = display_name
+        ext.modified_time = modified_time
+        indexer.index_package(ext)
+
+    def names(sort_by, sort_order=0, text="", offset=0, limit=3):
+        _, page, _ = indexer.query(text, offset=offset, limit=limit,
+                                   sort_by=sort_by, sort_order=sort_order)
+        return [pack.name for pack in page]
+
+    assert names(2) == ["package2", "package1", "package3"]
+    assert names(2, sort_order=2) == ["package3", "package1", "package2"]
+    assert names(1) == ["package2", "package1", "package3"]
+    assert names(1, offset=1, limit=1) == ["package1"]
+    assert names(2, text="mocked") == ["package2", "package1", "package3"]
+
+
+def test_query_ranks_what_the_trie_finds(indexer):
+    old = MockedExtension()
+    old.filename = "old.vsix"
+    old.version = "0.1.0"
+    old.tags = ["legacy"]
+    new = MockedExtension()
+    new.filename = "new.vsix"
+    new.version = "0.2.0"
+    new.tags = ["python-lint"]
+    indexer.index_package(old)
+    indexer.index_package(new)
+    extension_pack = indexer.extensions["mocker"]["mocked_extension"]
+
+    # The trie holds the words of every version, the ranking only the
+    # latest one.
+    assert indexer.search("legacy") == {extension_pack}
+    assert indexer.query("legacy")[0] == []
+    assert indexer.query("lint p")[0] == [extension_pack]
+    assert indexer.query("lint", sort_by=2)[1] == [extension_pack]
+
+
+@pytest.mark.parametrize("sort_by, sort_order", [(0, 0), (2, 0), (2, 2)])
+def test_query_cursor_survives_new_packages(indexer, sort_by, sort_order):
+    def add(name):
+        ext = MockedExtension()
+        ext.filename = f"{name}.vsix"
+        ext.name = name
+        ext.display_name = name
+        indexer.index_package(ext)
+
+    for name in ["package1", "package3", "package5", "package7"]:
+        add(name)
+
+    _, first, key = indexer.query("", limit=2, sort_by=sort_by,
+                                  sort_order=sort_order)
+    add("package0")
+    add("package9")
+    _, second, _ = indexer.query("", limit=2, sort_by=sort_by,
+                                 sort_order=sort_order, after=key)
+
+    served = [pack.name for pack in first + second]
+    assert len(set(served)) == 4
+    expected = ["package1", "package3", "package5", "package7"]
+    if sort_order == 2:
+        expected.reverse()
+    assert served == expected
+
+
+def test_query_last_page_has_no_cursor(indexer):
+    indexer.index_package(MockedExtension())
+
+    _, page, key = indexer.query("", limit=1)
+    assert len(page) == 1
+    assert key is None
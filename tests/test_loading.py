@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+from backend.server.loading import AsyncLoader
+
+
+def test_single_flight():
+    loader = AsyncLoader(max_workers=4)
+    release = threading.Event()
+    calls = []
+
+    def read():
+        calls.append(1)
+        release.wait(timeout=5)
+        return b"readme"
+
+    async def main():
+        loads = [asyncio.ensure_future(loader.load("readme", read))
+                 for _ in range(10)]
+        await asyncio.sleep(0)
+        # Every caller is waiting on the one read in flight.
+        assert len(loader) == 1
+        release.set()
+        return await asyncio.gather(*loads)
+
+    assert asyncio.run(main()) == [b"readme"] * 10
+    assert len(calls) == 1
+    assert len(loader) == 0
+
+
+def test_event_loop_runs_during_cold_reads():
+    loader = AsyncLoader(max_workers=4)
+    release = threading.Event()
+
+    def cold_read(key):
+        release.wait(timeout=5)
+        return key
+
+    async def main():
+        loads = asyncio.gather(*[
+            loader.load(key, lambda key=key: cold_read(key))
+            for key in range(8)
+        ])
+        # Other coroutines keep running while every read is blocked.
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        assert not loads.done()
+        release.set()
+        return await loads
+
+    assert asyncio.run(main()) == list(range(8))
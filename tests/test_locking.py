@@ -0,0 +1,47 @@
+import threading
+
+from backend.server.locking import ReadWriteLock
+
+
+def test_readers_share_and_writers_wait():
+    lock = ReadWriteLock()
+    written = threading.Event()
+
+    def write():
+        with lock.writing():
+            written.set()
+
+    with lock.reading():
+        with lock.reading():
+            writer = threading.Thread(target=write)
+            writer.start()
+            assert not written.wait(0.05)
+
+    writer.join(5)
+    assert written.is_set()
+
+
+def test_waiting_writer_goes_before_new_readers():
+    lock = ReadWriteLock()
+    order = []
+
+    def write():
+        with lock.writing():
+            order.append("write")
+
+    def read():
+        with lock.reading():
+            order.append("read")
+
+    with lock.reading():
+        writer = threading.Thread(target=write)
+        writer.start()
+        while not lock._waiting_writers:
+            writer.join(0.01)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+
+    writer.join(5)
+    reader.join(5)
+    assert order == ["write", "read"]
@@ -0,0 +1,184 @@
+from pathlib import Path
+
+import pytest
+from starlette.testclient import TestClient
+
+from stub.vsix import build_vsix
+
+SERVER_DIR = Path(__file__).resolve().parent.parent / "backend" / "server"
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    # The app serves `static` relative to the working directory.
+    monkeypatch.chdir(str(SERVER_DIR))
+    from backend.server import main
+
+    exts = tmp_path / "exts"
+    exts.mkdir()
+    build_vsix(exts / "pylint.vsix", name="pylint", tags="python,lint")
+    build_vsix(exts / "gitlens.vsix", name="gitlens", tags="git")
+    indexer = main.Indexer(str(exts))
+    indexer.index_packages()
+
+    monkeypatch.setattr(main, "INDEXER", indexer)
+    monkeypatch.setattr(main, "SNAPSHOT", None)
+    monkeypatch.setattr(main, "QUERY_CACHE",
+                        main.LRUCache(max_bytes=1024 * 1024))
+    return main
+
+
+def query(client, criteria, flags=0x2):
+    return client.post("/_apis/public/gallery/extensionquery", json={
+        "filters": [{
+            "criteria": [{"filterType": filter_type, "value": value}
+                         for filter_type, value in criteria],
+            "flags": flags
+        }]
+    }, headers={"Accept-Encoding": "identity"})
+
+
+def test_query_cache_normalizes_keys(main):
+    client = TestClient(main.app)
+    first = query(client, [(10, "Python"), (5, "Other")])
+    again = query(client, [(5, "other"), (10, "python")])
+
+    assert first.content == again.content
+    assert len(first.json()["results"][0]["extensions"]) == 1
+    assert (main.QUERY_CACHE.hits, main.QUERY_CACHE.misses) == (1, 1)
+
+    # Flags that do not change the rendering share the entry.
+    query(client, [(10, "python"), (5, "other")], flags=0x2 | 0x8000)
+    assert (main.QUERY_CACHE.hits, main.QUERY_CACHE.misses) == (2, 1)
+    query(client, [(10, "python"), (5, "other")], flags=0x4)
+    assert (main.QUERY_CACHE.hits, main.QUERY_CACHE.misses) == (2, 2)
+
+
+def test_query_cache_follows_index_changes(main, tmp_path):
+    client = TestClient(main.app)
+    assert len(query(client, [(10, "mocked")]).json()["results"][0]
+               ["extensions"]) == 2
+
+    main.INDEXER.apply_batch(removed=[str(tmp_path / "exts" / "gitlens.vsix")])
+    assert len(query(client, [(10, "mocked")]).json()["results"][0]
+               ["extensions"]) == 1
+    assert main.QUERY_CACHE.misses == 2
+
+    stats = client.get("/stats").json()["queries"]
+    assert stats["entries"] == 2
+    assert stats["misses"] == 2
+    assert stats["hits"] == 0
+
+
+def test_paging_token_is_tied_to_its_query(main):
+    client = TestClient(main.app)
+
+    def page(text, token=None, sort_by=0):
+        return client.post("/_apis/public/gallery/extensionquery", json={
+            "filters": [{
+                "criteria": [{"filterType": 10, "value": text}],
+                "pageSize": 1,
+                "sortBy": sort_by,
+                "pagingToken": token
+            }]
+        })
+
+    first = page("mocked").json()["results"][0]
+    token = first["pagingToken"]
+    second = page("Mocked", token).json()["results"][0]
+    assert second["pagingToken"] is None
+    assert {first["extensions"][0]["extensionName"],
+            second["extensions"][0]["extensionName"]} == {"pylint", "gitlens"}
+
+    assert page("pylint", token).status_code == 400
+    assert page("mocked", token, sort_by=2).status_code == 400
+    assert page("mocked", "not a token").status_code == 400
+
+
+def test_paging_token_keys_are_checked(main):
+    client = TestClient(main.app)
+
+    def page(token=None):
+        return client.post("/_apis/public/gallery/extensionquery", json={
+            "filters": [{
+                "criteria": [{"filterType": 10, "value": "mocked"}],
+                "pageSize": 1,
+                "sortBy": 4,
+                "pagingToken": token
+            }]
+        })
+
+    token = page().json()["results"][0]["pagingToken"]
+    assert page(token).status_code == 200
+
+    # Keys that cannot be compared with the sort keys are bad tokens.
+    cursor = main.decode_token(token)
+    for key in ("xyz", [{"a": 1}], [0, "a"], ["a"] * 5):
+        tampered = main.encode_token(cursor._replace(key=key))
+        assert page(tampered).status_code == 400
+
+
+def test_index_updates_reach_other_workers(main, tmp_path, monkeypatch):
+    exts = tmp_path / "exts"
+    store = main.SnapshotStore(str(tmp_path / "snapshot"), poll_seconds=0)
+    monkeypatch.setattr(main, "SNAPSHOT", store)
+    main.index_packages()
+
+    # Another worker, following the snapshot.
+    worker = main.Indexer(str(exts))
+    worker_store = main.SnapshotStore(store.path, poll_seconds=0)
+    worker_store.sync(worker)
+
+    generation = main.INDEXER.generation
+    build_vsix(exts / "black.vsix", name="black")
+    client = TestClient(main.app)
+    assert client.post("/index_batch", json={"updates": [
+        {"path": str(exts), "filename": "black.vsix"},
+        {"path": str(exts), "filename": "gitlens.vsix",
+         "type_names": ["IN_DELETE"]}
+    ]}).json() == {"status": "OK"}
+
+    assert sorted(pack.name for pack in main.INDEXER.extension_packs) == \
+        ["black", "pylint"]
+    assert main.INDEXER.generation > generation
+
+    assert sorted(worker_store.sync(worker)) == \
+        [str(exts / "black.vsix"), str(exts / "gitlens.vsix")]
+    assert sorted(pack.name for pack in worker.extension_packs) == \
+        ["black", "pylint"]
+
+
+def test_snapshot_catch_up_does_not_hold_up_requests(main, tmp_path,
+                                                     monkeypatch):
+    exts = tmp_path / "exts"
+    store = main.SnapshotStore(str(tmp_path / "snapshot"), poll_seconds=0)
+    monkeypatch.setattr(main, "SNAPSHOT", store)
+    main.index_packages()
+
+    # Another worker indexes a package.
+    other = main.Indexer(str(exts))
+    other_store = main.SnapshotStore(store.path)
+    black = build_vsix(exts / "black.vsix", name="black")
+    with other_store.locked():
+        other_store.sync(other)
+        other.apply_batch(indexed=[black])
+        other_store.publish(other, [black])
+
+    client = TestClient(main.app)
+    with main.INDEX_LOCK:
+        # Catching up waits for the lock, the request does not.
+        assert client.get("/stats").status_code == 200
+        assert "black" not in main.INDEXER.extensions["mocker"]
+
+    # Catch up here unless the background catch-up started, then wait
+    # for it.
+    main.follow_snapshot()
+    with main.FOLLOWING:
+        assert "black" in main.INDEXER.extensions["mocker"]
+
+
+def test_check_index_runs_outside_the_index_lock(main):
+    client = TestClient(main.app)
+    with main.INDEX_LOCK:
+        assert client.get("/check_index").json() == \
+            {"consistent": True, "differences": []}
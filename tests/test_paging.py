@@ -0,0 +1,24 @@
+from backend.server.paging import Cursor, encode_token, decode_token, \
+    query_digest
+
+
+def test_token_round_trip():
+    cursor = Cursor(generation=3, position=50,
+                    query=query_digest(["python", [], 2, True]),
+                    key=("python", "ms-python", "python", "ms-python",
+                         "python"))
+
+    assert decode_token(encode_token(cursor)) == cursor
+
+
+def test_invalid_tokens():
+    assert decode_token("not a token") is None
+    assert decode_token(encode_token(Cursor(1, 2, "", ()))[:-4]) is None
+    assert decode_token(encode_token(Cursor(1, 2, "", ({"a": 1},)))) is None
+
+
+def test_query_digest():
+    assert query_digest(["python", [[5, "other"]], 0, False]) == \
+        query_digest(["python", [[5, "other"]], 0, False])
+    assert query_digest(["python", [], 0, False]) != \
+        query_digest(["python", [], 0, True])
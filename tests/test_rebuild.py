@@ -0,0 +1,124 @@
+import threading
+
+from backend.server.rebuild import BackgroundRebuild, RUNNING, DONE, FAILED
+from backend.server.indexer import Indexer
+from stub.vsix import build_vsix
+
+
+def wait(rebuild):
+    for thread in threading.enumerate():
+        if thread.name == "index-rebuild":
+            thread.join(5)
+
+    return rebuild.status
+
+
+def test_rebuild_swaps_with_replayed_changes():
+    rebuild = BackgroundRebuild()
+    building = threading.Event()
+    release = threading.Event()
+    swapped = []
+
+    def build(progress):
+        progress(1, 2)
+        building.set()
+        release.wait(5)
+        progress(2, 2)
+        return "fresh"
+
+    def swap(fresh, take_touched):
+        swapped.append((fresh, take_touched()))
+
+    rebuild.touch(["before.vsix"])
+    assert rebuild.start(build, swap)
+    building.wait(5)
+    assert rebuild.status["status"] == RUNNING
+    assert (rebuild.status["indexed"], rebuild.status["total"]) == (1, 2)
+    assert not rebuild.start(build, swap)
+
+    rebuild.touch(["during.vsix"])
+    release.set()
+    status = wait(rebuild)
+
+    assert status["status"] == DONE
+    assert status["indexed"] == 2
+    assert status["finished"].endswith("Z")
+    assert swapped == [("fresh", {"during.vsix"})]
+
+
+def test_failed_rebuild_keeps_serving():
+    rebuild = BackgroundRebuild()
+
+    def build(progress):
+        raise OSError("no such directory")
+
+    swapped = []
+    rebuild.start(build, lambda fresh, take_touched: swapped.append(fresh))
+    status = wait(rebuild)
+
+    assert status["status"] == FAILED
+    assert status["error"] == "no such directory"
+    assert swapped == []
+
+
+def test_index_packages_progress(tmp_path):
+    build_vsix(tmp_path / "one.vsix", name="package1")
+    build_vsix(tmp_path / "two.vsix", name="package2")
+    progress = []
+
+    Indexer(str(tmp_path)).index_packages(
+        progress=lambda done, total: progress.append((done, total)))
+    assert progress == [(1, 2), (2, 2)]
+
+
+def test_rebuild_parses_across_processes(tmp_path):
+    build_vsix(tmp_path / "one.vsix", name="package1")
+    build_vsix(tmp_path / "two.vsix", name="package2")
+    rebuild = BackgroundRebuild()
+    swapped = []
+
+    def build(progress):
+        fresh = Indexer(str(tmp_path), workers=2)
+        fresh.index_packages(progress=progress)
+        return fresh
+
+    rebuild.start(build, lambda fresh, take_touched: swapped.append(fresh))
+    assert wait(rebuild)["status"] == DONE
+    assert len(swapped[0].extension_packs) == 2
+
+
+def test_processes_share_one_rebuild(tmp_path):
+    # Two processes' views of the same rebuild state.
+    path = str(tmp_path / "rebuild")
+    rebuild, other = BackgroundRebuild(path), BackgroundRebuild(path)
+    assert other.status["status"] == "idle"
+
+    release = threading.Event()
+
+    def build(progress):
+        release.wait(5)
+        progress(2, 2)
+        return "fresh"
+
+    assert rebuild.start(build, lambda fresh, take_touched: None)
+    assert not other.start(build, lambda fresh, take_touched: None)
+    assert other.status["status"] == RUNNING
+    assert other.status["started"] == rebuild.status["started"]
+
+    release.set()
+    assert wait(rebuild)["status"] == DONE
+    assert other.status["status"] == DONE
+    assert other.status["indexed"] == 2
+    assert other.start(lambda progress: "fresh",
+                       lambda fresh, take_touched: None)
+    wait(other)
+
+
+def test_interrupted_rebuild_is_reported(tmp_path):
+    path = tmp_path / "rebuild"
+    path.write_text('{"status": "running", "indexed": 1, "total": 2, '
+                    '"started": null, "finished": null, "error": null}')
+
+    status = BackgroundRebuild(str(path)).status
+    assert status["status"] == FAILED
+    assert status["error"] == "interrupted"
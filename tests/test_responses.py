@@ -0,0 +1,108 @@
+import gzip
+import asyncio
+from types import SimpleNamespace
+from email.utils import formatdate
+
+from backend.server import responses
+from backend.server.responses import asset_response, etag_matches, \
+    not_modified_since, negotiate_encoding, compress, file_etag
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+
+
+def test_file_etag_variants(tmp_path):
+    path = tmp_path / "package.vsix"
+    path.write_bytes(b"data")
+    stats = path.stat()
+
+    tags = {file_etag(stats, path), file_etag(stats, path, "gzip"),
+            file_etag(stats, path, variant=64),
+            file_etag(stats, path, variant=128)}
+    assert len(tags) == 4
+    assert file_etag(stats, path, variant=64) == \
+        file_etag(stats, path, variant=64)
+
+
+def test_not_modified_since():
+    assert not_modified_since(formatdate(1000, usegmt=True), 1000.5)
+    assert not not_modified_since(formatdate(999, usegmt=True), 1000)
+    assert not not_modified_since("not a date", 1000)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_asset_response(tmp_path):
+    path = tmp_path / "package.vsix"
+    path.write_bytes(b"data")
+    extension = SimpleNamespace(filename=path)
+    loads = []
+
+    async def load(encoding):
+        loads.append(1)
+        return b"content"
+
+    def respond(**headers):
+        return run(asset_response(SimpleNamespace(headers=headers), extension,
+                                  path.stat(), load, media_type="text/plain"))
+
+    response = respond()
+    assert response.status_code == 200
+    assert response.body == b"content"
+    assert "immutable" in response.headers["cache-control"]
+
+    etag = response.headers["etag"]
+    assert respond(**{"if-none-match": etag}).status_code == 304
+    assert respond(**{"if-modified-since":
+                      response.headers["last-modified"]}).status_code == 304
+    # If-None-Match takes precedence over If-Modified-Since.
+    assert respond(**{"if-none-match": '"other"',
+                      "if-modified-since":
+                      response.headers["last-modified"]}).status_code == 200
+    assert len(loads) == 2
+
+
+def test_negotiate_encoding(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+    assert negotiate_encoding("gzip, deflate, br") == "gzip"
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding("*") == "gzip"
+    assert negotiate_encoding("") is None
+
+    monkeypatch.setattr(responses, "brotli", object())
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0.5") == "gzip"
+
+
+def test_compressed_asset_response(tmp_path, monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+    path = tmp_path / "package.vsix"
+    path.write_bytes(b"data")
+    extension = SimpleNamespace(filename=path)
+
+    async def load(encoding):
+        return compress(b"# readme" * 100, encoding)
+
+    def respond(**headers):
+        return run(asset_response(SimpleNamespace(headers=headers), extension,
+                                  path.stat(), load,
+                                  media_type="text/markdown",
+                                  compressible=True))
+
+    plain = respond()
+    compressed = respond(**{"accept-encoding": "gzip"})
+    assert plain.headers["vary"] == compressed.headers["vary"] == \
+        "Accept-Encoding"
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(compressed.body) == plain.body
+    assert plain.headers["etag"] != compressed.headers["etag"]
+    assert respond(**{"accept-encoding": "gzip",
+                      "if-none-match": plain.headers["etag"]}) \
+        .status_code == 200
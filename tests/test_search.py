@@ -0,0 +1,99 @@
+from backend.server.search import SearchIndex, tokenize
+
+
+def fields(name, description="", tags="", publisher="mocker"):
+    return {
+        "name": name,
+        "display_name": name,
+        "tags": tags,
+        "publisher": publisher,
+        "description": description
+    }
+
+
+def build_index():
+    index = SearchIndex()
+    index.add("pylint", fields("pylint", "Python linting", "python,lint"),
+              order=("pylint",))
+    index.add("python", fields("python", "Python language support",
+                               "python"), order=("python",))
+    index.add("gitlens", fields("gitlens", "Git supercharged", "git"),
+              order=("gitlens",))
+    index.add("black", fields("black", "Formatter for python code"),
+              order=("black",))
+    return index
+
+
+def test_tokenize():
+    assert tokenize("Python-lint, (GIT) tool_kit.") == \
+        ["python", "lint", "git", "tool", "kit"]
+
+
+def test_ranks_name_matches_first():
+    matches, page = build_index().search("python")
+
+    assert set(matches) == {"pylint", "python", "black"}
+    assert page[0] == "python"
+    assert page[-1] == "black"
+
+
+def test_prefix_matches():
+    matches, _ = build_index().search("pyth")
+
+    assert set(matches) == {"pylint", "python", "black"}
+
+
+def test_prefix_matches_every_expansion():
+    index = SearchIndex()
+    for number in range(200):
+        index.add(f"package{number}", fields(f"package{number}"),
+                  order=(number,))
+
+    matches, _ = index.search("p")
+    assert len(matches) == 200
+    matches, _ = index.search("package1 mocker", within={"package1",
+                                                          "package10"})
+    assert set(matches) == {"package1", "package10"}
+
+    # Looking a few candidates up scores them as merging does.
+    assert index.score(["p"], within={3}) == {3: index.score(["p"])[3]}
+
+
+def test_exact_matches_rank_above_prefix_matches():
+    index = SearchIndex()
+    index.add("linter", fields("linter"), order=("a",))
+    index.add("lint", fields("lint"), order=("b",))
+
+    assert index.search("lint")[1] == ["lint", "linter"]
+
+
+def test_pagination_is_deterministic():
+    index = build_index()
+    _, everything = index.search("")
+
+    assert everything == ["black", "gitlens", "pylint", "python"]
+    pages = [index.search("", offset=offset, limit=2)[1]
+             for offset in (0, 2)]
+    assert pages == [everything[:2], everything[2:]]
+
+
+def test_readding_replaces_document():
+    index = build_index()
+    index.add("gitlens", fields("gitlens", "History viewer"),
+              order=("gitlens",))
+
+    assert index.search("supercharged")[0] == []
+    assert index.search("history")[0] == ["gitlens"]
+
+    index.remove("gitlens")
+    assert index.search("history")[0] == []
+    assert len(index) == 3
+
+
+def test_terms_are_intersected_case_insensitively():
+    index = build_index()
+
+    assert index.search("python lint")[0] == ["pylint"]
+    assert index.search("PYTHON Lint")[0] == ["pylint"]
+    assert index.search("python git")[0] == []
+    assert index.search("python nonexistent")[0] == []
@@ -0,0 +1,128 @@
+from dataclasses import asdict
+
+from backend.server.indexer import Indexer
+from backend.server.manifest import Manifest
+from backend.server.snapshot import Snapshot, SnapshotStore, write_snapshot, \
+    read_generation
+from stub.vsix import build_vsix
+
+
+def manifest(name):
+    return Manifest(publisher="mocker", name=name, version="0.1.0",
+                    display_name=None, description="", icon_path=None,
+                    tags=["a"], categories=[], properties={}, assets={})
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot")
+    assert read_generation(path) == 0
+
+    write_snapshot(path, 3, [("one.vsix", 10, 20, manifest("one")),
+                             ("two.vsix", 30, 40, manifest("two"))])
+    assert read_generation(path) == 3
+    with Snapshot(path) as snapshot:
+        assert snapshot.generation == 3
+        assert snapshot.keys == [["one.vsix", 10, 20], ["two.vsix", 30, 40]]
+        assert asdict(snapshot.metadata(1)) == asdict(manifest("two"))
+
+    write_snapshot(path, 4, [])
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 0
+
+
+def test_processes_follow_published_changes(tmp_path):
+    exts = tmp_path / "exts"
+    exts.mkdir()
+    one = build_vsix(exts / "one.vsix", name="package1")
+    two = build_vsix(exts / "two.vsix", name="package2")
+    path = str(tmp_path / "snapshot")
+
+    # The indexing process and a worker, each with its own index.
+    publisher, publisher_store = Indexer(str(exts)), SnapshotStore(path)
+    worker, worker_store = Indexer(str(exts)), SnapshotStore(path)
+
+    publisher.index_packages()
+    publisher_store.publish(publisher)
+    assert worker_store.pending()
+    assert sorted(worker_store.sync(worker)) == [one, two]
+    assert not worker_store.pending()
+    assert worker_store.sync(worker) == []
+
+    # Changes go to the journal; the base snapshot stays as it is.
+    three = build_vsix(exts / "three.vsix", name="package3")
+    publisher.apply_batch(indexed=[three], removed=[one])
+    publisher_store.publish(publisher, [three, one])
+    assert read_generation(path) == 1
+    assert worker_store.pending()
+    assert sorted(worker_store.sync(worker)) == [one, three]
+
+    assert sorted(pack.name for pack in worker.extension_packs) == \
+        ["package2", "package3"]
+    assert {pack.name for pack in worker.search("package")} == \
+        {pack.name for pack in publisher.search("package")}
+    assert worker_store.generation == publisher_store.generation == 2
+
+    # A removed pack that comes back is a pack again.
+    build_vsix(exts / "one.vsix", name="package1")
+    publisher.apply_batch(indexed=[one])
+    publisher_store.publish(publisher, [one])
+    worker_store.sync(worker)
+    assert len(worker.extension_packs) == 3
+
+
+def test_journal_is_compacted(tmp_path):
+    exts = tmp_path / "exts"
+    exts.mkdir()
+    one = build_vsix(exts / "one.vsix", name="package1")
+    path = str(tmp_path / "snapshot")
+
+    publisher, publisher_store = Indexer(str(exts)), SnapshotStore(path)
+    worker, worker_store = Indexer(str(exts)), SnapshotStore(path)
+    publisher.index_packages()
+    publisher_store.publish(publisher)
+    worker_store.sync(worker)
+
+    # Once the journal outgrows the base, a new base replaces both.
+    for generation in range(2, 5):
+        publisher.apply_batch(indexed=[one])
+        publisher_store.publish(publisher, [one])
+
+    # Nothing changed on disk, so the worker is already in line with it.
+    assert read_generation(path) == 4
+    assert worker_store.sync(worker) == []
+    assert worker_store.generation == 4
+
+    two = build_vsix(exts / "two.vsix", name="package2")
+    publisher.apply_batch(indexed=[two])
+    publisher_store.publish(publisher, [two])
+    assert worker_store.sync(worker) == [two]
+    assert len(worker.extension_packs) == 2
+
+
+def test_partial_journal_entries_wait(tmp_path):
+    exts = tmp_path / "exts"
+    exts.mkdir()
+    build_vsix(exts / "one.vsix", name="package1")
+    path = str(tmp_path / "snapshot")
+
+    publisher, publisher_store = Indexer(str(exts)), SnapshotStore(path)
+    worker, worker_store = Indexer(str(exts)), SnapshotStore(path)
+    publisher.index_packages()
+    publisher_store.publish(publisher)
+    worker_store.sync(worker)
+
+    two = build_vsix(exts / "two.vsix", name="package2")
+    publisher.apply_batch(indexed=[two])
+    publisher_store.publish(publisher, [two])
+    with open(f"{path}.journal", "rb") as file:
+        journal = file.read()
+
+    # A writer is midway through appending the entry.
+    with open(f"{path}.journal", "wb") as file:
+        file.write(journal[:-10])
+
+    assert worker_store.sync(worker) == []
+    with open(f"{path}.journal", "wb") as file:
+        file.write(journal)
+
+    assert worker_store.sync(worker) == [two]
@@ -0,0 +1,39 @@
+import pytest
+
+from backend.server.sorting import SortedIndex
+
+
+@pytest.fixture
+def index():
+    index = SortedIndex()
+    for item in "dbeac":
+        index.add(item, (item,))
+
+    return index
+
+
+def test_page_of_everything(index):
+    assert index.page(0, 2) == ["a", "b"]
+    assert index.page(2, 2) == ["c", "d"]
+    assert index.page(4, 2) == ["e"]
+    assert index.page(0, 2, descending=True) == ["e", "d"]
+    assert index.page(4, 2, descending=True) == ["a"]
+    assert index.page(6, 2, descending=True) == []
+
+
+@pytest.mark.parametrize("within", [{"a", "c", "e"}, {"e"}])
+def test_page_of_subset(index, within):
+    ordered = sorted(within)
+
+    assert index.page(0, 2, within=within) == ordered[:2]
+    assert index.page(1, 2, within=within) == ordered[1:3]
+    assert index.page(0, 2, descending=True, within=within) == \
+        ordered[::-1][:2]
+
+
+def test_moving_and_removing(index):
+    index.add("a", ("z",))
+    index.remove("c")
+
+    assert index.page(0, 10) == ["b", "d", "e", "a"]
+    assert len(index) == 4
@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.server import streaming
+from backend.server.streaming import parse_range, RangeNotSatisfiable, \
+    region_response
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 10)
+    assert parse_range("bytes=90-", 100) == (90, 100)
+    assert parse_range("bytes=-10", 100) == (90, 100)
+    assert parse_range("bytes=-1000", 100) == (0, 100)
+    assert parse_range("bytes=50-1000", 100) == (50, 100)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    assert parse_range("bytes=a-b", 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=100-", 100)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=-0", 100)
+
+
+def send_response(response):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(response({"type": "http"}, None, send))
+    return messages[0], b"".join(message.get("body", b"")
+                                 for message in messages[1:])
+
+
+@pytest.mark.parametrize("range_header, if_range, status, body", [
+    (None, None, 200, b"3456789"),
+    ("bytes=2-3", None, 206, b"56"),
+    ("bytes=2-3", '"tag"', 206, b"56"),
+    ("bytes=2-3", '"old"', 200, b"3456789"),
+    ("bytes=7-", None, 416, b"")
+])
+def test_region_response(tmp_path, monkeypatch, range_header, if_range,
+                         status, body):
+    monkeypatch.setattr(streaming, "CHUNK_SIZE", 2)
+    path = tmp_path / "file"
+    path.write_bytes(b"0123456789")
+    headers = {}
+    if range_header is not None:
+        headers["range"] = range_header
+    if if_range is not None:
+        headers["if-range"] = if_range
+
+    request = SimpleNamespace(headers=headers, method="GET")
+    response = region_response(request, str(path), 3, 7,
+                               headers={"ETag": '"tag"'},
+                               media_type="text/plain")
+    start, sent = send_response(response)
+    assert start["status"] == status
+    assert sent == body
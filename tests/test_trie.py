@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from backend.server.indexer import Trie
+
+
+def prefixes(word):
+    return [word[:length] for length in range(len(word) + 1)]
+
+
+def test_matches_prefix_sets():
+    rng = random.Random(1)
+    trie = Trie()
+    expected = {}
+    for element in range(50):
+        for _ in range(5):
+            word = "".join(rng.choice("abc -") for _ in range(rng.randint(0, 8)))
+            trie.add(element, word)
+            for prefix in prefixes(word):
+                expected.setdefault(prefix, set()).add(element)
+
+    for prefix, elements in expected.items():
+        assert trie.get(prefix) == elements
+
+    with pytest.raises(RuntimeError):
+        trie.get("abcabcabcabc")
+
+
+def test_illegal_char_keeps_legal_prefix():
+    trie = Trie()
+
+    with pytest.raises(RuntimeError):
+        trie.add("element", "great (tool)")
+
+    assert trie.get("great ") == {"element"}
+    with pytest.raises(RuntimeError):
+        trie.get("great (")
+
+
+def test_removing_all_words_frees_nodes():
+    trie = Trie()
+    trie.add_words("one", ["python", "pylint", "lint"])
+    trie.add_words("two", ["python", "pytest"])
+
+    trie.remove_words("one", ["python", "pylint", "lint"])
+
+    assert trie.get("py") == {"two"}
+    assert trie.get("") == {"two"}
+    with pytest.raises(RuntimeError):
+        trie.get("lint")
+    with pytest.raises(RuntimeError):
+        trie.get("pyl")
+    assert "one" not in trie._ids
+
+
+def test_removing_one_word_keeps_shared_prefixes():
+    trie = Trie()
+    trie.add_words("one", ["python", "pylint"])
+    trie.add_words("two", ["pylint"])
+
+    trie.remove("one", "pylint")
+
+    assert trie.get("py") == {"one", "two"}
+    assert trie.get("pyt") == {"one"}
+    assert trie.get("pyl") == {"two"}
+
+    trie.remove("one", "python")
+    assert trie.get("") == {"two"}
+    assert len(trie) == 1